@@ -1,39 +1,277 @@
-from PIL import Image
+from __future__ import annotations
 
+import argparse
+import json
+from pathlib import Path
 
-def analyze_file(filename, mode="RGB"):
+from lazy import lazy_module
+from pixel_cache import add_pixel_cache_option, default_cache
+from pixel_engine import channel_max, channel_min, use_pixel_cache, view_rgba
+
+np = lazy_module("numpy")
+
+# Rows converted to an array at a time; keeps extra memory bounded on huge images.
+BAND_ROWS = 256
+SAMPLE_SIZE = 5
+# Where the sweep looks for suggestions, as [lo, hi) histogram ranges. The fixes
+# target near-white edges, light grays and faint alpha; splits elsewhere (e.g.
+# between a dark motif and its light border) are not usable parameters.
+WHITE_LEVELS = (192, 256)  # min channel of "white": threshold 0..63
+GRAY_LEVELS = (100, 256)  # min_value
+FAINT_ALPHAS = (1, 128)  # min_alpha
+
+
+def _empty_category() -> dict:
+    return {
+        "count": 0,
+        "bbox": None,  # [left, upper, right, lower], right/lower exclusive
+        "histogram": np.zeros((4, 256), dtype=np.int64),
+        "sample": [],
+    }
+
+
+def _accumulate(cat: dict, band: np.ndarray, mask: np.ndarray, y0: int) -> None:
+    ys, xs = np.nonzero(mask)
+    if ys.size == 0:
+        return
+    cat["count"] += int(ys.size)
+
+    left, upper = int(xs.min()), int(ys[0]) + y0
+    right, lower = int(xs.max()) + 1, int(ys[-1]) + y0 + 1
+    if cat["bbox"] is None:
+        cat["bbox"] = [left, upper, right, lower]
+    else:
+        bbox = cat["bbox"]
+        cat["bbox"] = [
+            min(bbox[0], left),
+            min(bbox[1], upper),
+            max(bbox[2], right),
+            max(bbox[3], lower),
+        ]
+
+    pixels = band[ys, xs]
+    for c in range(4):
+        cat["histogram"][c] += np.bincount(pixels[:, c], minlength=256)
+
+    # np.nonzero is in raster order, so the sample is the first matches in the image.
+    for i in range(min(SAMPLE_SIZE - len(cat["sample"]), ys.size)):
+        cat["sample"].append(
+            (int(xs[i]), int(ys[i]) + y0, tuple(int(v) for v in pixels[i]))
+        )
+
+
+def icon_stats(filename: str, mode: str = "RGB", threshold: int = 120) -> dict:
+    """Count light pixels (all channels > threshold), split by visibility.
+
+    The image is scanned in bands of BAND_ROWS rows, so memory stays bounded: per
+    category only a count, a bounding box, per-channel (RGBA) histograms and a small
+    sample of (x, y, (r, g, b, a)) coordinates are kept. With the pixel cache on, the
+    pixels are mapped rather than decoded and bands are paged in as they are scanned.
+    """
+    rgba = view_rgba(Path(filename))
+    h, w = rgba.shape[:2]
+
+    visible_white = _empty_category()
+    transparent_white = _empty_category()
+    for y0 in range(0, h, BAND_ROWS):
+        band = rgba[y0 : y0 + BAND_ROWS]
+        if mode != "RGBA":
+            opaque = np.full(band.shape[:2], 255, dtype=np.uint8)
+            band = np.dstack([band[..., :3], opaque])
+
+        white = (band[..., :3] > threshold).all(axis=2)
+        visible = band[..., 3] > 0
+        _accumulate(visible_white, band, white & visible, y0)
+        _accumulate(transparent_white, band, white & ~visible, y0)
+
+    for cat in (visible_white, transparent_white):
+        hist = cat.pop("histogram")
+        cat["histogram"] = {ch: hist[i].tolist() for i, ch in enumerate("rgba")}
+
+    return {
+        "path": str(filename),
+        "mode": mode,
+        "size": f"{w}x{h}",
+        "threshold": threshold,
+        "visible_white": visible_white,
+        "transparent_white": transparent_white,
+    }
+
+
+def _otsu(hist: np.ndarray, levels: tuple[int, int] = (0, 256)) -> int | None:
+    """Otsu's split of hist[lo:hi]: the lowest value of the upper class."""
+    lo, hi = levels
+    hist = hist[lo:hi]
+    total = hist.sum()
+    if total == 0:
+        return None
+    p = hist / total
+    omega = np.cumsum(p)
+    mu = np.cumsum(p * np.arange(hist.size))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    between[~np.isfinite(between)] = -1.0
+    if between.max() <= 0:
+        return None  # a single value: nothing to split
+    return lo + int(between.argmax()) + 1
+
+
+def threshold_sweep(
+    filename: str,
+    *,
+    min_value: int = 160,
+    max_delta: int = 80,
+    min_alpha: int = 20,
+) -> dict:
+    """Pixels the fix predicates select, for every threshold at once.
+
+    Both predicates only look at min(R, G, B), max - min and alpha, so one banded
+    pass builds histograms of those and each count is a cumulative sum:
+
+        edge_white[t]         _is_edge_white(threshold=t), t = 0..255
+        light_gray[v][d]      _is_light_gray(min_value=v, max_delta=d) at min_alpha
+        light_gray_alpha[a]   _is_light_gray(min_alpha=a) at min_value, max_delta
+
+    "suggested" holds Otsu splits of the same histograms, each searched only over its
+    plausible range: the edge-white threshold splitting pixels with min >= 192, the
+    min_value splitting low-saturation pixels with min >= 100, and the min_alpha
+    splitting light-gray pixels with alpha 1..127 (None where that part of the
+    histogram holds a single value).
+    """
+    rgba = view_rgba(Path(filename))
+    h, w = rgba.shape[:2]
+
+    visible_min = np.zeros(256, dtype=np.int64)
+    gray = np.zeros(256 * 256, dtype=np.int64)  # (min, max - min) at min_alpha
+    gray_alpha = np.zeros(256, dtype=np.int64)
+    for y0 in range(0, h, BAND_ROWS):
+        band = rgba[y0 : y0 + BAND_ROWS]
+        mn = channel_min(band)
+        delta = channel_max(band) - mn
+        alpha = band[..., 3]
+        visible_min += np.bincount(mn[alpha > 0], minlength=256)
+        keep = alpha >= min_alpha
+        cell = mn[keep].astype(np.intp) * 256 + delta[keep]
+        gray += np.bincount(cell, minlength=gray.size)
+        light = (mn >= min_value) & (delta <= max_delta)
+        gray_alpha += np.bincount(alpha[light], minlength=256)
+    gray = gray.reshape(256, 256)
+
+    def at_least(hist: np.ndarray) -> np.ndarray:
+        return np.cumsum(hist[::-1], axis=0)[::-1]
+
+    # edge_white[t] counts min >= 255 - t: sum the histogram from 255 downwards.
+    edge_white = np.cumsum(visible_min[::-1])
+    light_gray = at_least(np.cumsum(gray, axis=1))
+
+    white_level = _otsu(visible_min, WHITE_LEVELS)
+    gray_level = _otsu(gray[:, : max_delta + 1].sum(axis=1), GRAY_LEVELS)
+    return {
+        "path": str(filename),
+        "size": f"{w}x{h}",
+        "params": {
+            "min_value": min_value,
+            "max_delta": max_delta,
+            "min_alpha": min_alpha,
+        },
+        "edge_white": edge_white.tolist(),
+        "light_gray": light_gray.tolist(),
+        "light_gray_alpha": at_least(gray_alpha).tolist(),
+        "suggested": {
+            "threshold": None if white_level is None else 255 - white_level,
+            "min_value": gray_level,
+            "min_alpha": _otsu(gray_alpha, FAINT_ALPHAS),
+        },
+    }
+
+
+def sweep_file(filename: str, **params: int) -> dict:
+    print(f"\nSweeping {filename}")
+    sweep = threshold_sweep(filename, **params)
+    p = sweep["params"]
+
+    print("Edge white (alpha > 0, min channel >= 255 - threshold):")
+    print("  " + "  ".join(f"{t}:{sweep['edge_white'][t]}" for t in range(0, 65, 5)))
+    print(
+        f"Light gray (alpha >= {p['min_alpha']}, max - min <= {p['max_delta']}) "
+        "by min_value:"
+    )
+    row = [r[p["max_delta"]] for r in sweep["light_gray"]]
+    print("  " + "  ".join(f"{v}:{row[v]}" for v in range(100, 256, 20)))
+    print(f"Light gray (min >= {p['min_value']}) by min_alpha:")
+    alpha = sweep["light_gray_alpha"]
+    print("  " + "  ".join(f"{a}:{alpha[a]}" for a in (1, 10, 20, 50, 100, 200, 255)))
+    suggested = ", ".join(f"{k}={v}" for k, v in sweep["suggested"].items())
+    print(f"Suggested (Otsu): {suggested}")
+    return sweep
+
+
+def analyze_file(filename, mode="RGB", threshold=120):
     print(f"\nAnalyzing {filename} ({mode})")
-    img = Image.open(filename).convert(mode)
-    w, h = img.size
-    px = img.load()
-
-    visible_white = []
-    transparent_white = []
-    for y in range(h):
-        for x in range(w):
-            r, g, b = (0, 0, 0)
-            a = 255
-            if mode == "RGBA":
-                r, g, b, a = px[x, y]
-            else:
-                r, g, b = px[x, y]
-
-            if r > 120 and g > 120 and b > 120:
-                if a > 0:
-                    visible_white.append((x, y, (r, g, b, a)))
-                else:
-                    transparent_white.append((x, y, (r, g, b, a)))
-
-    print(f"Visible white pixels: {len(visible_white)}")
-    if visible_white:
-        for i in range(min(5, len(visible_white))):
-            print(f"  {visible_white[i]}")
-    print(f"Transparent white pixels: {len(transparent_white)}")
-    if transparent_white:
-        for i in range(min(5, len(transparent_white))):
-            print(f"  {transparent_white[i]}")
+    stats = icon_stats(filename, mode, threshold)
+
+    for label, key in (
+        ("Visible white pixels", "visible_white"),
+        ("Transparent white pixels", "transparent_white"),
+    ):
+        cat = stats[key]
+        print(f"{label}: {cat['count']}")
+        if cat["count"]:
+            print(f"  bbox: {tuple(cat['bbox'])}")
+            for px in cat["sample"]:
+                print(f"  {px}")
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Report light pixels in icons.")
+    parser.add_argument("files", nargs="*", help="images to analyze")
+    parser.add_argument("--mode", choices=("RGB", "RGBA"), default="RGBA")
+    parser.add_argument("--threshold", type=int, default=120)
+    parser.add_argument(
+        "--json", action="store_true", help="print machine-readable stats only"
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="count fix candidates for every threshold and suggest thresholds",
+    )
+    parser.add_argument("--min-value", type=int, default=160)
+    parser.add_argument("--max-delta", type=int, default=80)
+    parser.add_argument("--min-alpha", type=int, default=20)
+    add_pixel_cache_option(parser)
+    args = parser.parse_args(argv)
+    if args.pixel_cache is not None:
+        repo = Path(__file__).resolve().parents[1]
+        use_pixel_cache(default_cache(repo), args.pixel_cache << 20)
+
+    if args.files:
+        jobs = [(f, args.mode) for f in args.files]
+    else:
+        jobs = [
+            ("assets/images/icon.png", "RGB"),
+            ("assets/images/android-icon-foreground.png", "RGBA"),
+        ]
+
+    if args.sweep:
+        params = {
+            "min_value": args.min_value,
+            "max_delta": args.max_delta,
+            "min_alpha": args.min_alpha,
+        }
+        if args.json:
+            sweeps = [threshold_sweep(f, **params) for f, _ in jobs]
+            print(json.dumps(sweeps))
+        else:
+            for f, _ in jobs:
+                sweep_file(f, **params)
+    elif args.json:
+        stats = [icon_stats(f, mode, args.threshold) for f, mode in jobs]
+        print(json.dumps(stats, indent=2))
+    else:
+        for f, mode in jobs:
+            analyze_file(f, mode, args.threshold)
 
 
 if __name__ == "__main__":
-    analyze_file("assets/images/icon.png", "RGB")
-    analyze_file("assets/images/android-icon-foreground.png", "RGBA")
+    main()
@@ -0,0 +1,328 @@
+"""Before/after diff of fixed assets against their backups.
+
+    python scripts/asset_diff.py                       # files of the latest backup run
+    python scripts/asset_diff.py android/app/src/main/res --tile 32
+    python scripts/asset_diff.py --run 20260101-120000 --json
+
+Every image is compared with its copy in the backup store (tools/iconfix-backup/), tile
+by tile: how many pixels changed, the largest channel delta and SSIM over
+premultiplied RGBA. Files whose bytes differ but whose pixels do not (a re-encode) are
+reported as pixel-identical. For each changed file a heat map of the per-pixel delta,
+drawn over a dimmed copy of the new image, is written under tools/asset-cache/diff/.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import time
+from pathlib import Path
+
+from backup_store import blob_path, default_store, find_backup, list_runs, load_run
+from build_cache import file_digest
+from encode import save_image
+from lazy import lazy_module
+from pixel_engine import view_rgba
+
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
+
+TILE = 64
+IMAGE_SUFFIXES = {".png", ".webp"}
+# SSIM stabilizers for 8-bit data (Wang et al. 2004).
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+@functools.cache
+def _heat_lut() -> np.ndarray:
+    """Black -> red -> yellow -> white for deltas 0..255."""
+    t = np.arange(256) / 255 * 3
+    return (np.clip(np.stack([t, t - 1, t - 2], axis=1), 0, 1) * 255).astype(np.uint8)
+
+
+def _premultiplied(tiles: np.ndarray) -> np.ndarray:
+    out = tiles.astype(np.float32)
+    out[..., :3] *= out[..., 3:] * np.float32(1 / 255)
+    return out
+
+
+def _max_delta(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Largest per-channel difference of two RGBA arrays, staying in uint8."""
+    d = np.maximum(a, b) - np.minimum(a, b)
+    return np.maximum(
+        np.maximum(d[..., 0], d[..., 1]), np.maximum(d[..., 2], d[..., 3])
+    )
+
+
+def tile_stats(
+    before: np.ndarray, after: np.ndarray, tile: int = TILE
+) -> tuple[dict, np.ndarray]:
+    """Per-tile comparison of two (H, W, 4) RGBA arrays of the same shape.
+
+    Returns ({"changed", "max_delta", "ssim"}, per-pixel max channel delta). Each
+    value is a (tiles_y, tiles_x) array: changed-pixel count, largest channel delta
+    and SSIM. SSIM is computed over each whole tile, per premultiplied channel, and
+    averaged over the channels; only changed tiles need it, the others are 1. The work
+    is vectorized one row of tiles at a time.
+    """
+    h, w = after.shape[:2]
+    tiles_y, tiles_x = -(-h // tile), -(-w // tile)
+    pad = [(0, 0), (0, tiles_x * tile - w), (0, 0)]
+    widths = np.full(tiles_x, tile)
+    widths[-1] = w - tile * (tiles_x - 1)
+
+    changed = np.zeros((tiles_y, tiles_x), dtype=np.int64)
+    max_delta = np.zeros((tiles_y, tiles_x), dtype=np.uint8)
+    ssim = np.ones((tiles_y, tiles_x))
+    delta = np.empty((h, w), dtype=np.uint8)
+    for i, y0 in enumerate(range(0, h, tile)):
+        b, a = before[y0 : y0 + tile], after[y0 : y0 + tile]
+        if pad[1][1]:
+            b, a = np.pad(b, pad), np.pad(a, pad)
+        rows = b.shape[0]
+        d = _max_delta(a, b)
+        delta[y0 : y0 + tile] = d[:, :w]
+        d = d.reshape(rows, tiles_x, tile)
+        changed[i] = np.count_nonzero(d, axis=(0, 2))
+        max_delta[i] = d.max(axis=(0, 2))
+        cols = np.flatnonzero(changed[i])
+        if not cols.size:
+            continue
+
+        # Only the changed tiles of this row: (rows, len(cols), tile, 4).
+        x = _premultiplied(b.reshape(rows, tiles_x, tile, 4)[:, cols])
+        y = _premultiplied(a.reshape(rows, tiles_x, tile, 4)[:, cols])
+        n = (rows * widths[cols])[:, None]
+        mu_x = x.sum(axis=(0, 2)) / n
+        mu_y = y.sum(axis=(0, 2)) / n
+        var_x = np.einsum("rktc,rktc->kc", x, x) / n - mu_x * mu_x
+        var_y = np.einsum("rktc,rktc->kc", y, y) / n - mu_y * mu_y
+        cov = np.einsum("rktc,rktc->kc", x, y) / n - mu_x * mu_y
+        per_channel = ((2 * mu_x * mu_y + _C1) * (2 * cov + _C2)) / (
+            (mu_x * mu_x + mu_y * mu_y + _C1) * (var_x + var_y + _C2)
+        )
+        ssim[i, cols] = per_channel.mean(axis=1)
+    return {"changed": changed, "max_delta": max_delta, "ssim": ssim}, delta
+
+
+def write_heatmap(after: np.ndarray, delta: np.ndarray, path: Path) -> None:
+    """Changed pixels colored by delta, over the new image at a third of its value."""
+    visible = after[..., :3].astype(np.uint16) * after[..., 3:] // (255 * 3)
+    heat = np.where(
+        (delta > 0)[..., None], _heat_lut()[delta], visible.astype(np.uint8)
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    save_image(Image.fromarray(heat), path, "PNG", "fast")
+
+
+def diff_image(
+    before_path: Path, after_path: Path, tile: int = TILE, heatmap: Path | None = None
+) -> dict:
+    """Compare an image with its backup. With `heatmap`, draw one if anything changed."""
+    start = time.perf_counter()
+    before, after = view_rgba(before_path), view_rgba(after_path)
+    result: dict = {"path": str(after_path), "backup": str(before_path)}
+    if before.shape != after.shape:
+        result["size_changed"] = [f"{a.shape[1]}x{a.shape[0]}" for a in (before, after)]
+        result["seconds"] = round(time.perf_counter() - start, 4)
+        return result
+
+    tiles, delta = tile_stats(before, after, tile)
+    touched = tiles["changed"] > 0
+    result.update(
+        {
+            "size": f"{after.shape[1]}x{after.shape[0]}",
+            "tile": tile,
+            "changed_pixels": int(tiles["changed"].sum()),
+            "changed_tiles": int(touched.sum()),
+            "tiles": int(touched.size),
+            "max_delta": int(tiles["max_delta"].max()),
+            "min_ssim": round(float(tiles["ssim"].min()), 4),
+            "mean_ssim": round(float(tiles["ssim"].mean()), 4),
+            "per_tile": {
+                k: np.round(v, 4).tolist() if k == "ssim" else v.tolist()
+                for k, v in tiles.items()
+            },
+        }
+    )
+    if heatmap is not None and touched.any():
+        write_heatmap(after, delta, heatmap)
+        result["heatmap"] = str(heatmap)
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def _expand(paths: list[Path]) -> list[Path]:
+    files: list[Path] = []
+    for p in paths:
+        if p.is_dir():
+            files += sorted(
+                f for f in p.rglob("*") if f.suffix.lower() in IMAGE_SUFFIXES
+            )
+        else:
+            files.append(p)
+    return files
+
+
+def main(argv: list[str] | None = None) -> None:
+    repo = Path(__file__).resolve().parents[1]
+
+    parser = argparse.ArgumentParser(
+        description="Compare fixed assets with their backups, tile by tile."
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        type=Path,
+        help="images or directories to check (default: the files of the run)",
+    )
+    parser.add_argument("--store", type=Path, default=default_store(repo))
+    parser.add_argument(
+        "--run", help="compare against this backup run (default: latest per file)"
+    )
+    parser.add_argument("--tile", type=int, default=TILE, metavar="PX")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=0,
+        metavar="N",
+        help="compare files on N worker processes (default: one per CPU core)",
+    )
+    parser.add_argument(
+        "--heatmaps",
+        type=Path,
+        default=repo / "tools" / "asset-cache" / "diff",
+        metavar="DIR",
+        help="where heat maps of changed files go",
+    )
+    parser.add_argument(
+        "--json", action="store_true", help="print machine-readable results only"
+    )
+    args = parser.parse_args(argv)
+    store: Path = args.store
+    start = time.perf_counter()
+
+    runs = list_runs(store)
+    if not runs:
+        raise SystemExit(f"No backups in {store}")
+    if args.run is not None and args.run not in runs:
+        raise SystemExit(f"Unknown run: {args.run}")
+    run_files = load_run(store, args.run or runs[-1])["files"]
+
+    # (repo-relative path, backup blob); files without a backup are reported only.
+    targets: list[tuple[str, Path]] = []
+    missing: list[str] = []
+    if args.paths:
+        for p in _expand([(Path.cwd() / p).resolve() for p in args.paths]):
+            rel = Path(os.path.relpath(p, repo)).as_posix()
+            if args.run is not None:
+                entry = run_files.get(rel)
+                found = entry and (args.run, blob_path(store, entry["sha256"]))
+            else:
+                found = find_backup(store, rel)
+            if found:
+                targets.append((rel, found[1]))
+            else:
+                missing.append(rel)
+    else:
+        for rel, entry in sorted(run_files.items()):
+            targets.append((rel, blob_path(store, entry["sha256"])))
+
+    # Blobs are named by content hash: byte-identical files need no decoding.
+    unchanged: list[str] = []
+    todo: list[tuple[str, Path]] = []
+    for rel, blob in targets:
+        current = repo / rel
+        if not current.exists():
+            missing.append(rel)
+        elif file_digest(current) == blob.name:
+            unchanged.append(rel)
+        else:
+            todo.append((rel, blob))
+
+    def heatmap(rel: str) -> Path:
+        return args.heatmaps / f"{rel}.diff.png"
+
+    # One file that cannot be decoded is reported as failed, not the whole check.
+    jobs = min(args.jobs or os.cpu_count() or 1, max(1, len(todo)))
+    calls = {rel: (blob, repo / rel, args.tile, heatmap(rel)) for rel, blob in todo}
+    outcomes: dict[str, dict | Exception] = {}
+    if jobs <= 1:
+        for rel, call in calls.items():
+            try:
+                outcomes[rel] = diff_image(*call)
+            except Exception as e:  # noqa: BLE001
+                outcomes[rel] = e
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = {
+                rel: pool.submit(diff_image, *call) for rel, call in calls.items()
+            }
+            for rel, future in futures.items():
+                try:
+                    outcomes[rel] = future.result()
+                except Exception as e:  # noqa: BLE001
+                    outcomes[rel] = e
+
+    # Re-encoded by the fix run but with the same pixels: not a change.
+    changed: list[tuple[str, dict]] = []
+    identical: list[str] = []
+    failed: list[tuple[str, Exception]] = []
+    for rel, r in outcomes.items():
+        if isinstance(r, Exception):
+            failed.append((rel, r))
+        elif r.get("changed_pixels", 1) == 0:
+            identical.append(rel)
+        else:
+            changed.append((rel, r))
+
+    if args.json:
+        report = {
+            "results": [r for _, r in changed],
+            "pixel_identical": identical,
+            "unchanged": unchanged,
+            "missing": missing,
+            "failed": {rel: repr(e) for rel, e in failed},
+        }
+        print(json.dumps(report))
+        if failed:
+            raise SystemExit(1)
+        return
+
+    for rel, r in changed:
+        if "size_changed" in r:
+            print(f"! {rel}: size {r['size_changed'][0]} -> {r['size_changed'][1]}")
+            continue
+        print(
+            f"~ {rel}: {r['changed_pixels']} px changed in {r['changed_tiles']}/"
+            f"{r['tiles']} tiles, max delta {r['max_delta']}, "
+            f"SSIM min {r['min_ssim']:.4f} mean {r['mean_ssim']:.4f}"
+        )
+        if "heatmap" in r:
+            print(f"  heat map: {os.path.relpath(r['heatmap'], repo)}")
+    for rel in identical:
+        print(f"= {rel}: pixel-identical (re-encoded)")
+    for rel in unchanged:
+        print(f"= {rel}: unchanged")
+    for rel in missing:
+        print(f"? {rel}: no backup or no current file")
+    for rel, e in failed:
+        print(f"! {rel}: failed: {e!r}")
+    print(
+        f"{len(todo) + len(unchanged)} compared: {len(changed)} changed, "
+        f"{len(identical)} pixel-identical, {len(unchanged)} unchanged, "
+        f"{len(missing)} missing, {len(failed)} failed "
+        f"({time.perf_counter() - start:.2f}s)"
+    )
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Recipe files: which passes run on which assets.
+
+A recipe file (scripts/asset_recipes.json) holds named sets of rules. Each rule maps
+repo-relative glob patterns to an ordered list of stages:
+
+    {"op": "make_edge_white_transparent", "params": {"threshold": 10}}
+    {"op": "fix_alpha_bleeding", "params": {"replacement_rgb": "$bg"}, "mode": "RGBA"}
+
+"$name" values are taken from the top-level "vars"; "mode" limits a stage to images
+of that PIL mode (read from the file header). A file gets the stages of the first
+rule that matches it.
+
+compile_plan() turns a set into jobs. Targets with the same content, stages and output
+format are one job: the passes run once and the result is copied to the others.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Callable
+from pathlib import Path
+
+from build_cache import file_digest, recipe_key
+from image_probe import image_mode
+
+DEFAULT_RECIPES = Path(__file__).resolve().with_name("asset_recipes.json")
+
+
+def load_recipes(path: Path = DEFAULT_RECIPES) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _resolve(value: object, variables: dict) -> object:
+    if isinstance(value, str) and value.startswith("$"):
+        try:
+            return variables[value[1:]]
+        except KeyError:
+            raise ValueError(f"Unknown recipe variable: {value}") from None
+    if isinstance(value, dict):
+        return {k: _resolve(v, variables) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_resolve(v, variables) for v in value]
+    return value
+
+
+def match_targets(recipes: dict, set_name: str, repo: Path) -> list[tuple[Path, list]]:
+    """(path, rule stages) for every existing file matched by the set, in rule order."""
+    try:
+        rules = recipes["sets"][set_name]
+    except KeyError:
+        raise ValueError(f"Unknown recipe set: {set_name}") from None
+    variables = recipes.get("vars", {})
+
+    matched: list[tuple[Path, list]] = []
+    seen: set[Path] = set()
+    for rule in rules:
+        stages = _resolve(rule["stages"], variables)
+        for pattern in rule["match"]:
+            for p in sorted(repo.glob(pattern)):
+                if p in seen or not p.is_file():
+                    continue
+                seen.add(p)
+                matched.append((p, stages))
+    return matched
+
+
+def stages_for_mode(stages: list, mode: str | None) -> list[tuple[str, dict]]:
+    """The (op, params) stages that apply to an image of PIL `mode`.
+
+    With mode=None (unknown) every stage is kept.
+    """
+    return [
+        (s["op"], s.get("params", {}))
+        for s in stages
+        if mode is None or s.get("mode") in (None, mode)
+    ]
+
+
+def compile_plan(
+    recipes: dict,
+    set_name: str,
+    repo: Path,
+    *,
+    mode_of: Callable[[Path], str] = image_mode,
+) -> list[dict]:
+    """Group the matched targets into deduplicated jobs.
+
+    Each job is {"key", "stages", "targets", "recipes"}: "stages" run on
+    targets[0] and the output is copied to the other targets. "recipes" holds, per
+    target, the mode-independent recipe used for build-cache lookups, so a pass that
+    changes the mode (e.g. flattens to RGB) does not invalidate its own output.
+    "key" identifies the work (content, stages, format) and is stable across runs.
+    """
+    jobs: dict[str, dict] = {}
+    for p, stages in match_targets(recipes, set_name, repo):
+        try:
+            mode = mode_of(p)
+        except Exception:  # noqa: BLE001
+            # Unreadable or corrupt: keep every stage, so processing fails this file
+            # and reports it along with the others' results.
+            mode = None
+        run = stages_for_mode(stages, mode)
+        key = recipe_key(
+            "fix", {"source": file_digest(p), "stages": run, "format": p.suffix.lower()}
+        )
+        job = jobs.setdefault(
+            key, {"key": key, "stages": run, "targets": [], "recipes": []}
+        )
+        job["targets"].append(p)
+        job["recipes"].append(
+            {"stages": [(s["op"], s.get("params", {})) for s in stages]}
+        )
+    return list(jobs.values())
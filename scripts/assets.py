@@ -0,0 +1,44 @@
+"""One command line for the asset scripts.
+
+    python scripts/assets.py fix                  # "default" rule set of the recipes
+    python scripts/assets.py fix --set recolor    # what the script itself runs
+    python scripts/assets.py generate --profile fast
+    python scripts/assets.py analyze assets/images/icon.png --sweep
+    python scripts/assets.py bench --sizes 1024
+    python scripts/assets.py diff android/app/src/main/res
+    python scripts/assets.py backup list
+
+Arguments after the subcommand go to that script's main() unchanged (`fix --help`
+lists them). A script is only imported when its subcommand runs, and numpy/Pillow
+only once pixels are touched (see lazy.py), so --help and up-to-date builds return
+quickly enough to run from a build hook for every variant.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+
+# Subcommand -> (module, summary).
+COMMANDS = {
+    "analyze": ("analyze_icon", "report light pixels in icons"),
+    "fix": ("fix_white_edge_transparency", "remove white edges from app icons"),
+    "generate": ("generate_play_store_assets", "generate Play Store listing assets"),
+    "bench": ("bench_assets", "benchmark the asset scripts"),
+    "diff": ("asset_diff", "compare fixed assets with their backups"),
+    "backup": ("backup_store", "list, restore or prune icon-fix backups"),
+}
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Build and check the app's assets.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="COMMAND")
+    for name, (module, summary) in COMMANDS.items():
+        # The script's own parser handles everything after the name, -h included.
+        commands.add_parser(name, help=summary, add_help=False, prefix_chars="\0")
+    args, rest = parser.parse_known_args(argv)
+    importlib.import_module(COMMANDS[args.command][0]).main(rest)
+
+
+if __name__ == "__main__":
+    main()
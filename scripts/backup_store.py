@@ -0,0 +1,212 @@
+"""Content-addressed backup store for the asset scripts.
+
+Layout under the store root (tools/iconfix-backup/):
+
+    objects/<2 hex>/<sha256>     one blob per distinct file content
+    runs/<YYYYmmdd-HHMMSS>.json  one small manifest per backup run
+
+A run only writes blobs that are not already stored, so backup time and disk use grow
+with the amount of change rather than the number of runs.
+
+    python scripts/backup_store.py list
+    python scripts/backup_store.py restore [--run RUN] [PATH ...]
+    python scripts/backup_store.py prune --keep 20 --max-age-days 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime as _dt
+import json
+import os
+import shutil
+from pathlib import Path
+
+from build_cache import file_digest
+
+RUN_TIME_FORMAT = "%Y%m%d-%H%M%S"
+
+
+def default_store(repo: Path) -> Path:
+    return repo / "tools" / "iconfix-backup"
+
+
+def blob_path(store: Path, digest: str) -> Path:
+    return store / "objects" / digest[:2] / digest
+
+
+def _write_atomic(dst: Path, data_src: Path | None = None, text: str = "") -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(dst.name + ".tmp")
+    if data_src is not None:
+        shutil.copyfile(data_src, tmp)
+    else:
+        tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, dst)
+
+
+def backup_files(store: Path, repo: Path, paths: list[Path]) -> tuple[str, int]:
+    """Back up `paths` (inside `repo`) as a new run. Returns (run id, new blob count)."""
+    now = _dt.datetime.now()
+    run_id = now.strftime(RUN_TIME_FORMAT)
+    suffix = 1
+    while (store / "runs" / f"{run_id}.json").exists():
+        suffix += 1
+        run_id = f"{now.strftime(RUN_TIME_FORMAT)}-{suffix}"
+
+    files: dict[str, dict] = {}
+    new_blobs = 0
+    for p in paths:
+        digest = file_digest(p)
+        blob = blob_path(store, digest)
+        if not blob.exists():
+            _write_atomic(blob, data_src=p)
+            new_blobs += 1
+        st = p.stat()
+        files[p.relative_to(repo).as_posix()] = {
+            "sha256": digest,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+        }
+
+    manifest = {"created": now.isoformat(timespec="seconds"), "files": files}
+    _write_atomic(
+        store / "runs" / f"{run_id}.json", text=json.dumps(manifest, indent=2)
+    )
+    return run_id, new_blobs
+
+
+def list_runs(store: Path) -> list[str]:
+    """Run ids, oldest first."""
+    runs_dir = store / "runs"
+    if not runs_dir.is_dir():
+        return []
+    return sorted(p.stem for p in runs_dir.glob("*.json"))
+
+
+def load_run(store: Path, run_id: str) -> dict:
+    return json.loads((store / "runs" / f"{run_id}.json").read_text(encoding="utf-8"))
+
+
+def find_backup(store: Path, rel: str) -> tuple[str, Path] | None:
+    """Most recent (run id, blob) holding `rel` (a repo-relative posix path)."""
+    for run_id in reversed(list_runs(store)):
+        entry = load_run(store, run_id)["files"].get(rel)
+        if entry is not None:
+            return run_id, blob_path(store, entry["sha256"])
+    return None
+
+
+def restore_run(
+    store: Path, repo: Path, run_id: str, only: list[str] | None = None
+) -> list[str]:
+    """Copy the files of a run back into `repo`. Returns the restored relative paths."""
+    files = load_run(store, run_id)["files"]
+    restored: list[str] = []
+    for rel, entry in files.items():
+        if only and rel not in only:
+            continue
+        dst = repo / rel
+        _write_atomic(dst, data_src=blob_path(store, entry["sha256"]))
+        os.utime(dst, (entry["mtime"], entry["mtime"]))
+        restored.append(rel)
+    return restored
+
+
+def prune(
+    store: Path, *, keep: int | None = None, max_age_days: float | None = None
+) -> tuple[list[str], int]:
+    """Drop runs beyond the retention limits, then garbage-collect unreferenced blobs.
+
+    The newest run is always kept. Returns (removed run ids, removed blob count).
+    """
+    runs = list_runs(store)
+    doomed: set[str] = set()
+    if keep is not None:
+        doomed.update(runs[: max(0, len(runs) - max(keep, 1))])
+    if max_age_days is not None:
+        cutoff = _dt.datetime.now() - _dt.timedelta(days=max_age_days)
+        for run_id in runs[:-1]:
+            created = _dt.datetime.fromisoformat(load_run(store, run_id)["created"])
+            if created < cutoff:
+                doomed.add(run_id)
+
+    for run_id in doomed:
+        (store / "runs" / f"{run_id}.json").unlink()
+
+    live: set[str] = set()
+    for run_id in list_runs(store):
+        live.update(e["sha256"] for e in load_run(store, run_id)["files"].values())
+
+    removed_blobs = 0
+    objects = store / "objects"
+    if objects.is_dir():
+        for blob in objects.glob("*/*"):
+            if blob.name not in live:
+                blob.unlink()
+                removed_blobs += 1
+    return sorted(doomed), removed_blobs
+
+
+def main(argv: list[str] | None = None) -> None:
+    repo = Path(__file__).resolve().parents[1]
+
+    parser = argparse.ArgumentParser(description="Manage icon-fix backups.")
+    parser.add_argument("--store", type=Path, default=default_store(repo))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="list backup runs")
+    p_restore = sub.add_parser("restore", help="restore files from a run")
+    p_restore.add_argument("--run", help="run id (default: latest)")
+    p_restore.add_argument("paths", nargs="*", help="repo-relative paths to restore")
+    p_prune = sub.add_parser("prune", help="apply retention limits and GC blobs")
+    p_prune.add_argument("--keep", type=int, help="keep at most N most recent runs")
+    p_prune.add_argument("--max-age-days", type=float, help="drop runs older than this")
+    args = parser.parse_args(argv)
+
+    store: Path = args.store
+
+    if args.command == "list":
+        for run_id in list_runs(store):
+            files = load_run(store, run_id)["files"]
+            print(f"{run_id}: {len(files)} files")
+        return
+
+    if args.command == "restore":
+        runs = list_runs(store)
+        if not runs:
+            raise SystemExit(f"No backups in {store}")
+        if args.run is not None and args.run not in runs:
+            raise SystemExit(f"Unknown run: {args.run}")
+        wanted = [Path(p).as_posix() for p in args.paths]
+        if not wanted:
+            for rel in restore_run(store, repo, args.run or runs[-1]):
+                print(f"Restored: {rel}")
+            return
+
+        # Runs only hold the files that were stale, so without --run each path comes
+        # from the newest run that has it.
+        by_run: dict[str, list[str]] = {}
+        for rel in wanted:
+            found = (args.run, None) if args.run else find_backup(store, rel)
+            if found is not None:
+                by_run.setdefault(found[0], []).append(rel)
+        restored: set[str] = set()
+        for run_id, rels in by_run.items():
+            for rel in restore_run(store, repo, run_id, rels):
+                print(f"Restored: {rel} (run {run_id})")
+                restored.add(rel)
+        missing = [rel for rel in wanted if rel not in restored]
+        if missing:
+            raise SystemExit("No backup of: " + ", ".join(missing))
+        return
+
+    if args.keep is None and args.max_age_days is None:
+        raise SystemExit("prune needs --keep and/or --max-age-days")
+    removed_runs, removed_blobs = prune(
+        store, keep=args.keep, max_age_days=args.max_age_days
+    )
+    print(f"Removed {len(removed_runs)} runs and {removed_blobs} unreferenced blobs.")
+
+
+if __name__ == "__main__":
+    main()
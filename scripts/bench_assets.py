@@ -0,0 +1,319 @@
+"""Benchmarks for the image-processing scripts on synthetic icons.
+
+    python scripts/bench_assets.py --output bench.json
+    python scripts/bench_assets.py --sizes 512 1024 --baseline bench.json
+
+Every case runs in a fresh process so peak RSS is per case. With --baseline, cases
+slower than the baseline by more than --tolerance are reported and the exit code is 1.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime as _dt
+import importlib
+import io
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from lazy import lazy_module
+
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
+ImageDraw = lazy_module("PIL.ImageDraw")
+ImageFilter = lazy_module("PIL.ImageFilter")
+
+DEFAULT_SIZES = (512, 1024, 2048, 4096)
+BG_COLOR = (0x1F, 0x29, 0x37)
+
+
+def make_fixture(size: int, kind: str, seed: int = 0) -> Image.Image:
+    """Synthetic icon: a motif with an antialiased white ring plus light-gray blobs.
+
+    kind: "transparent" (transparent background), "white" (opaque white background)
+    or "dark" (opaque BG_COLOR background).
+    """
+    rng = np.random.default_rng(seed)
+    background = {
+        "transparent": (255, 255, 255, 0),
+        "white": (255, 255, 255, 255),
+        "dark": (*BG_COLOR, 255),
+    }[kind]
+    img = Image.new("RGBA", (size, size), background)
+    draw = ImageDraw.Draw(img)
+
+    c = size // 2
+    r = size // 3
+    ring = max(2, size // 128)
+    draw.ellipse(
+        (c - r - ring, c - r - ring, c + r + ring, c + r + ring),
+        fill=(250, 250, 250, 255),
+    )
+    draw.ellipse((c - r, c - r, c + r, c + r), fill=(200, 60, 40, 255))
+    draw.ellipse(
+        (c - r // 3, c - r // 3, c + r // 3, c + r // 3), fill=(245, 245, 240, 255)
+    )
+
+    # Disconnected light-gray blobs outside the motif
+    for _ in range(12):
+        bx, by = (int(v) for v in rng.integers(0, size - size // 16, 2))
+        bw, bh = (int(v) for v in rng.integers(size // 64 + 2, size // 16, 2))
+        draw.ellipse((bx, by, bx + bw, by + bh), fill=(215, 215, 210, 220))
+
+    return img.filter(ImageFilter.GaussianBlur(max(1.0, size / 512)))
+
+
+def _fix_cases() -> dict[str, tuple[str, Callable[[Path, Path], object]]]:
+    import fix_white_edge_transparency as fix
+
+    bg = BG_COLOR
+    return {
+        "fill_transparent_with_color": (
+            "transparent",
+            lambda p, _: fix.fill_transparent_with_color(p, bg),
+        ),
+        "peel_and_recolor_edge": (
+            "dark",
+            lambda p, _: fix.peel_and_recolor_edge(p, bg),
+        ),
+        "peel_light_gray_border_transparent": (
+            "transparent",
+            lambda p, _: fix.peel_light_gray_border_transparent(p, iterations=15),
+        ),
+        "make_edge_white_transparent": (
+            "white",
+            lambda p, _: fix.make_edge_white_transparent(p),
+        ),
+        "make_edge_recolor_robust": (
+            "dark",
+            lambda p, _: fix.make_edge_recolor_robust(p, bg),
+        ),
+        "make_edge_white_recolor_png": (
+            "white",
+            lambda p, _: fix.make_edge_white_recolor_png(p, bg),
+        ),
+        "make_largest_near_white_component_transparent": (
+            "white",
+            lambda p, _: fix.make_largest_near_white_component_transparent(p),
+        ),
+        "make_largest_light_gray_component_transparent": (
+            "transparent",
+            lambda p, _: fix.make_largest_light_gray_component_transparent(p),
+        ),
+        "fix_alpha_bleeding": (
+            "transparent",
+            lambda p, _: fix.fix_alpha_bleeding(p, bg),
+        ),
+        "run_pipeline[splash]": (
+            "transparent",
+            lambda p, _: fix.run_pipeline(
+                p,
+                [
+                    ("fix_alpha_bleeding", {"replacement_rgb": bg}),
+                    ("make_largest_light_gray_component_transparent", {}),
+                    ("peel_light_gray_border_transparent", {"iterations": 15}),
+                ],
+            ),
+        ),
+    }
+
+
+def _other_cases() -> dict[str, tuple[str, Callable[[Path, Path], object]]]:
+    import analyze_icon
+    import asset_diff
+    import generate_play_store_assets as gen
+
+    def analyze(p: Path, _: Path) -> None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyze_icon.analyze_file(str(p), "RGBA")
+
+    icons = gen.ICON_OUTPUTS
+
+    return {
+        "_resize_square": (
+            "transparent",
+            lambda p, work: gen._resize_square(p, work / "out-icon.png", 512),
+        ),
+        "_resize_fanout": (
+            "transparent",
+            lambda p, work: gen._resize_fanout(
+                p, [(work / f"out-{size}.png", size, mode) for _, size, mode in icons]
+            ),
+        ),
+        "_generate_feature_graphic": (
+            "transparent",
+            lambda p, work: gen._generate_feature_graphic(
+                p, work / "fixture-bg.png", work / "out-feature.png"
+            ),
+        ),
+        "render_feature_graphics": (
+            "transparent",
+            lambda p, work: gen.render_feature_graphics(
+                gen.feature_specs(
+                    [
+                        {
+                            "output": f"out-feature-{i}.png",
+                            "icon": p,
+                            "background": "fixture-bg.png",
+                            "icon_ratio": ratio,
+                        }
+                        for i, ratio in enumerate((0.5, 0.5, 0.4, 0.4))
+                    ],
+                    work,
+                )
+            ),
+        ),
+        "analyze_file": ("transparent", analyze),
+        "threshold_sweep": (
+            "transparent",
+            lambda p, _: analyze_icon.threshold_sweep(str(p)),
+        ),
+        # Worst case: every tile differs between the two fixtures.
+        "diff_image": (
+            "transparent",
+            lambda p, work: asset_diff.diff_image(
+                work / "fixture-bg.png", p, heatmap=work / "out-diff.png"
+            ),
+        ),
+    }
+
+
+def all_cases() -> dict[str, tuple[str, Callable[[Path, Path], object]]]:
+    return {**_fix_cases(), **_other_cases()}
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_case(name: str, size: int, fixture: Path, repeat: int) -> dict:
+    """Time one case in the current (fresh) process. Reports the best of `repeat`."""
+    run = all_cases()[name][1]
+    # numpy and Pillow are imported on first use; do that before the clock starts.
+    importlib.import_module("numpy")
+    importlib.import_module("PIL.Image")
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        shutil.copyfile(fixture.with_name(f"dark-{size}.png"), work / "fixture-bg.png")
+        best = float("inf")
+        for _ in range(repeat):
+            target = work / "input.png"
+            shutil.copyfile(fixture, target)
+            start = time.perf_counter()
+            run(target, work)
+            best = min(best, time.perf_counter() - start)
+
+    return {
+        "case": name,
+        "size": size,
+        "seconds": round(best, 4),
+        "pixels_per_sec": round(size * size / best) if best > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """Describe every case that got slower than `baseline` by more than `tolerance`."""
+    base = {(r["case"], r["size"]): r for r in baseline}
+    regressions: list[str] = []
+    for r in results:
+        b = base.get((r["case"], r["size"]))
+        if b is None or not b["seconds"]:
+            continue
+        ratio = r["seconds"] / b["seconds"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{r['case']} @ {r['size']}px: {b['seconds']:.3f}s -> "
+                f"{r['seconds']:.3f}s ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the asset scripts.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument(
+        "--cases", nargs="+", help="only run these cases (substring match)"
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="best of N runs per case")
+    parser.add_argument("--output", type=Path, help="write JSON results here")
+    parser.add_argument("--baseline", type=Path, help="JSON results to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown vs baseline before failing (0.25 = 25%%)",
+    )
+    args = parser.parse_args(argv)
+
+    names = [
+        n for n in all_cases() if not args.cases or any(c in n for c in args.cases)
+    ]
+    kinds = {kind for kind, _ in all_cases().values()} | {"dark"}
+
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory() as tmp:
+        fixtures = Path(tmp)
+        for size in args.sizes:
+            for kind in sorted(kinds):
+                make_fixture(size, kind).save(fixtures / f"{kind}-{size}.png")
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # One process per case keeps peak RSS meaningful and isolates crashes.
+        ctx = multiprocessing.get_context("spawn")
+        for size in args.sizes:
+            for name in names:
+                fixture = fixtures / f"{all_cases()[name][0]}-{size}.png"
+                with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                    r = pool.submit(
+                        _run_case, name, size, fixture, args.repeat
+                    ).result()
+                results.append(r)
+                rss = f"{r['peak_rss_mb']:.0f} MB" if r["peak_rss_mb"] else "n/a"
+                print(
+                    f"{name:48s} {size:5d}px {r['seconds']:8.3f}s "
+                    f"{r['pixels_per_sec'] / 1e6:8.2f} Mpx/s  peak RSS {rss}"
+                )
+
+    report = {
+        "meta": {
+            "created": _dt.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pillow": Image.__version__,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote: {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import datetime as _dt
+import hashlib
+import json
+import os
+from collections.abc import Iterable
+from pathlib import Path
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's content."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def recipe_key(op: str, params: dict) -> str:
+    """Stable hash of an operation name and its parameters (tuples hash like lists)."""
+    blob = json.dumps({"op": op, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class BuildCache:
+    """Persistent manifest of what produced each output file.
+
+    Entries are keyed by the output path relative to `root` and record the recipe
+    (operation + parameters), the content hash of every input, the content hash of the
+    output and how long the rebuild took. An output is current when all of these still
+    match, so only changed sources or changed parameters trigger work.
+
+    In-place passes (the output is also the input) pass no `inputs`: the recorded output
+    hash alone tells whether the file was touched since it was last fixed.
+    """
+
+    def __init__(self, manifest: Path, root: Path, *, force: bool = False) -> None:
+        self.manifest = manifest
+        self.root = root
+        self.force = force
+        self.entries: dict[str, dict] = {}
+        if manifest.exists():
+            try:
+                self.entries = json.loads(manifest.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                # A corrupt manifest only costs a full rebuild.
+                self.entries = {}
+
+    def _rel(self, path: Path) -> str:
+        return Path(os.path.relpath(path, self.root)).as_posix()
+
+    def is_current(
+        self, target: Path, op: str, params: dict, inputs: Iterable[Path] = ()
+    ) -> bool:
+        if self.force or not target.exists():
+            return False
+        entry = self.entries.get(self._rel(target))
+        if entry is None or entry.get("recipe") != recipe_key(op, params):
+            return False
+        recorded = entry.get("inputs", {})
+        for p in inputs:
+            if not p.exists() or recorded.get(self._rel(p)) != file_digest(p):
+                return False
+        return entry.get("output") == file_digest(target)
+
+    def record(
+        self,
+        target: Path,
+        op: str,
+        params: dict,
+        inputs: Iterable[Path] = (),
+        *,
+        seconds: float,
+        encoding: dict | None = None,
+    ) -> None:
+        """Remember how `target` was built; `encoding` notes tuned encoder settings."""
+        entry = {
+            "op": op,
+            "recipe": recipe_key(op, params),
+            "inputs": {self._rel(p): file_digest(p) for p in inputs},
+            "output": file_digest(target),
+            "seconds": round(seconds, 4),
+            "built_at": _dt.datetime.now().isoformat(timespec="seconds"),
+        }
+        if encoding is not None:
+            entry["encoding"] = encoding
+        self.entries[self._rel(target)] = entry
+
+    def save(self) -> None:
+        self.manifest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(self.entries, indent=2, sort_keys=True), encoding="utf-8"
+        )
+        os.replace(tmp, self.manifest)
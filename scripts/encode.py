@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import argparse
+import io
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from image_probe import probe_header
+from instrument import timed
+from lazy import lazy_module
+
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
+
+# Encoder speed/size trade-offs, layered over each caller's own save options (which
+# keep deciding e.g. lossless vs lossy). "release" leaves them as they are, which is
+# maximum compression; "fast" is for iterating on thresholds.
+PROFILES: dict[str, dict[str, dict]] = {
+    "release": {},
+    "fast": {
+        "PNG": {"optimize": False, "compress_level": 1},
+        "WEBP": {"method": 0},
+    },
+}
+DEFAULT_PROFILE = "release"
+
+# Settings tried by smallest_encoding(); every one is lossless for its format.
+CANDIDATES: dict[str, list[dict]] = {
+    "PNG": [
+        {"optimize": True},
+        # zlib strategies: 1 = filtered, 2 = Huffman only, 3 = RLE
+        *({"compress_level": 9, "compress_type": t} for t in (1, 2, 3)),
+    ],
+    "WEBP": [
+        {"lossless": True, "quality": q, "method": m}
+        for m in (4, 5, 6)
+        for q in (75, 100)
+    ],
+}
+
+
+def add_encode_options(parser: argparse.ArgumentParser) -> None:
+    """--force, --profile and --smallest, shared by the scripts that write images."""
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="rebuild every output, even if the cache says it is up to date",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default=DEFAULT_PROFILE,
+        help="encoder settings: fast for iterating, release for smallest output",
+    )
+    parser.add_argument(
+        "--smallest",
+        action="store_true",
+        help="afterwards, try several encoder settings per file and keep the smallest",
+    )
+
+
+def profile_tag(profile: str) -> dict:
+    """Build-cache params for `profile`: empty for the default.
+
+    Outputs encoded with another profile then miss the cache, so fast encodes are
+    rebuilt once release settings are asked for again.
+    """
+    return {} if profile == DEFAULT_PROFILE else {"profile": profile}
+
+
+def encoder_options(fmt: str, options: dict, profile: str = DEFAULT_PROFILE) -> dict:
+    """Save options for `fmt` ("PNG"/"WEBP") with the profile's overrides applied."""
+    return {**options, **PROFILES[profile].get(fmt, {})}
+
+
+def save_image(
+    img: Image.Image, path: Path, fmt: str, profile: str = DEFAULT_PROFILE, **options
+) -> None:
+    with timed("encode"):
+        data = _encode(img, fmt, encoder_options(fmt, options, profile))
+    with timed("write"):
+        Path(path).write_bytes(data)
+
+
+def _encode(img: Image.Image, fmt: str, options: dict) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **options)
+    return buf.getvalue()
+
+
+def smallest_encoding(path: Path) -> dict | None:
+    """Re-encode a PNG or lossless WebP with every candidate and keep the smallest.
+
+    Candidates are encoded in parallel (Pillow releases the GIL while compressing) and
+    only accepted if they decode to exactly the same pixels. The file is rewritten only
+    when a candidate is smaller. Returns the chosen settings and the bytes saved, or
+    None for files that cannot be re-encoded losslessly (lossy WebP, other formats).
+    """
+    header = probe_header(path)
+    if header is None or not header["lossless"]:
+        return None
+    fmt = header["format"]
+    data = path.read_bytes()
+    with Image.open(io.BytesIO(data)) as im:
+        img = im.copy()
+    pixels = np.asarray(img.convert("RGBA"))
+
+    with ThreadPoolExecutor() as pool:
+        encoded = list(pool.map(lambda o: _encode(img, fmt, o), CANDIDATES[fmt]))
+
+    best: tuple[int, dict, bytes] | None = None
+    for options, blob in sorted(zip(CANDIDATES[fmt], encoded), key=lambda c: len(c[1])):
+        if len(blob) >= len(data):
+            break
+        with Image.open(io.BytesIO(blob)) as check:
+            if np.array_equal(np.asarray(check.convert("RGBA")), pixels):
+                best = (len(blob), options, blob)
+                break
+
+    result = {"format": fmt, "before": len(data), "after": len(data), "options": None}
+    if best is not None:
+        size, options, blob = best
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(blob)
+        tmp.replace(path)
+        result.update(after=size, options=options)
+    result["saved"] = result["before"] - result["after"]
+    return result
@@ -1,268 +1,269 @@
 from __future__ import annotations
 
-import datetime as _dt
+import argparse
+import json
 import os
-import shutil
-from collections import deque
+import sys
+import time
+from collections.abc import Callable, Sequence
 from pathlib import Path
 
-from PIL import Image
-
-
-def _is_edge_white(r: int, g: int, b: int, a: int, thr: int) -> bool:
+from asset_plan import DEFAULT_RECIPES, compile_plan, load_recipes, match_targets
+from backup_store import backup_files, default_store
+from build_cache import BuildCache
+from encode import (
+    DEFAULT_PROFILE,
+    add_encode_options,
+    profile_tag,
+    save_image,
+    smallest_encoding,
+)
+from image_probe import probe_header
+from instrument import collect, merge, profiled, rounded, timed
+from lazy import lazy_module
+from pixel_cache import add_pixel_cache_option, default_cache
+from pixel_engine import (
+    Region,
+    alpha_bbox,
+    border_seeds,
+    channel_max,
+    channel_min,
+    composite_over,
+    corner_seeds,
+    expand,
+    fill_where,
+    flood_fill,
+    keep_buffers,
+    largest_component,
+    load_rgba,
+    offset,
+    outside,
+    peel_mask,
+    pointwise,
+    rgb_equals_mask,
+    rgb_near_mask,
+    to_image,
+    union,
+    use_pixel_cache,
+    window,
+)
+from watch import BUFFER_BYTES, watch
+
+np = lazy_module("numpy")
+
+
+def _is_edge_white(arr: np.ndarray, thr: int) -> np.ndarray:
     # Only treat fully/mostly opaque whites as removable background.
-    if a <= 0:
-        return False
-    return r >= 255 - thr and g >= 255 - thr and b >= 255 - thr
+    return pointwise(lambda a: (a[..., 3] > 0) & (channel_min(a) >= 255 - thr), arr)
 
 
 def _is_light_gray(
-    r: int,
-    g: int,
-    b: int,
-    a: int,
+    arr: np.ndarray,
     *,
     min_value: int,
     max_delta: int,
     min_alpha: int,
-) -> bool:
-    if a < min_alpha:
-        return False
-    mn = min(r, g, b)
-    mx = max(r, g, b)
-    if mn < min_value:
-        return False
-    return (mx - mn) <= max_delta
+) -> np.ndarray:
+    def predicate(a: np.ndarray) -> np.ndarray:
+        mn = channel_min(a)
+        mx = channel_max(a)
+        return (a[..., 3] >= min_alpha) & (mn >= min_value) & ((mx - mn) <= max_delta)
 
+    return pointwise(predicate, arr)
 
-def fill_transparent_with_color(path: Path, bg_color: tuple[int, int, int]) -> dict:
-    """Fill fully transparent pixels with a specific solid color (solidifying the transparent area).
-    This prevents 'white bleeding' when an image with alpha is scaled or converted.
+
+# Encoders used by the passes. A pipeline writes its buffer once, with the encoder
+# of the last stage that changed the image, tuned by an encode profile.
+Saver = Callable[["np.ndarray", Path, str], None]
+Stage = tuple[str, dict]
+
+
+def _save_png(arr: np.ndarray, path: Path, profile: str) -> None:
+    save_image(to_image(arr), path, "PNG", profile, optimize=True)
+
+
+def _save_png_rgb(arr: np.ndarray, path: Path, profile: str) -> None:
+    # iOS icon compatibility: save as RGB (no alpha)
+    save_image(to_image(arr, "RGB"), path, "PNG", profile, optimize=True)
+
+
+def _save_in_place(arr: np.ndarray, path: Path, profile: str) -> None:
+    """Save with alpha in the format implied by the extension, keeping WebP lossless."""
+    if path.suffix.lower() == ".webp":
+        options = {"lossless": True, "quality": 100, "method": 6}
+        save_image(to_image(arr), path, "WEBP", profile, **options)
+    else:
+        save_image(to_image(arr), path, "PNG", profile, optimize=True)
+
+
+def _save_by_extension(arr: np.ndarray, path: Path, profile: str) -> None:
+    save_image(to_image(arr), path, _format_for(path), profile, optimize=True)
+
+
+def _format_for(path: Path) -> str:
+    return "WEBP" if path.suffix.lower() == ".webp" else "PNG"
+
+
+def _visible_region(arr: np.ndarray, ctx: dict) -> Region | None:
+    """Exact bounding box of alpha > 0, scanning only the tracked content window."""
+    known = ctx["content"]
+    if known is None:
+        return None
+    ys, xs = window(known)
+    exact = offset(alpha_bbox(arr[ys, xs, 3]), xs.start, ys.start)
+    ctx["content"] = exact
+    return exact
+
+
+def _changed(mask: np.ndarray, ys: slice, xs: slice) -> Region | None:
+    """Region of a changed-pixel mask computed on the crop arr[ys, xs]."""
+    return offset(alpha_bbox(mask), xs.start or 0, ys.start or 0)
+
+
+def _as_list(region: Region | None) -> list[int] | None:
+    return None if region is None else list(region)
+
+
+def _peel_light_gray(
+    arr: np.ndarray,
+    ctx: dict,
+    *,
+    iterations: int,
+    min_value: int,
+    max_delta: int,
+    min_alpha: int,
+    neighbor_alpha: int,
+) -> tuple[int, int, Region | None] | None:
+    """Clear light-gray pixels touching transparency in `arr` (in place).
+
+    Returns (cleared_pixels, iterations, changed region), or None when the image is
+    fully transparent.
     """
-    img = Image.open(path)
-    img_rgba = img.convert("RGBA")
-    px = img_rgba.load()
-    width, height = img_rgba.size
+    # Limit work to the alpha bounding box
+    bbox = _visible_region(arr, ctx)
+    if bbox is None:
+        return None
+
+    if neighbor_alpha < 0:
+        # Nothing can ever count as transparent.
+        return 0, 0, None
+
+    # Candidates lie within 1px of the bbox; one more pixel of halo lets them see
+    # their neighbors. Pixels beyond the crop are transparent and never candidates.
+    ys, xs = window(expand(bbox, 2, arr.shape))
+    crop = arr[ys, xs]
+    alpha = crop[..., 3]
+    left, upper, right, lower = expand(bbox, 1, arr.shape)
+    region = np.zeros(alpha.shape, dtype=bool)
+    region[upper - ys.start : lower - ys.start, left - xs.start : right - xs.start] = (
+        True
+    )
+
+    # RGB never changes while peeling and peeled pixels drop to alpha 0, so the
+    # candidate set is fixed up front and the frontier engine can grow it.
+    candidate = region & _is_light_gray(
+        crop, min_value=min_value, max_delta=max_delta, min_alpha=min_alpha
+    )
+    peeled, it_done = peel_mask(candidate, alpha <= neighbor_alpha, iterations)
+
+    cleared = peeled & (alpha != 0)
+    cleared_total = int(np.count_nonzero(cleared))
+    alpha[peeled] = 0
+
+    if min_alpha <= 0 and it_done:
+        # Cleared pixels still qualify as candidates, so every later pass finds
+        # something to (re)clear and the loop runs to the iteration limit.
+        it_done = iterations
+
+    return cleared_total, it_done, _changed(cleared, ys, xs)
+
 
+def _fill_transparent_with_color_op(
+    arr: np.ndarray, path: Path, ctx: dict, bg_color: tuple[int, int, int]
+) -> tuple[dict, Saver | None]:
     filled = 0
-    for y in range(height):
-        for x in range(width):
-            r, g, b, a = px[x, y]
-            if a == 0:
-                px[x, y] = (*bg_color, 0)
-                filled += 1
+    changed = None
+    content = ctx["content"] or (0, 0, 0, 0)
 
-    img_rgba.save(path, format="PNG", optimize=True)
-    return {"path": str(path), "filled_pixels": filled}
+    # Everything outside the content window is transparent: fill it wholesale.
+    for ys, xs in outside(content, arr.shape):
+        arr[ys, xs] = (*bg_color, 0)
+        filled += (ys.stop - ys.start) * (xs.stop - xs.start)
+        changed = union(changed, (xs.start, ys.start, xs.stop, ys.stop))
 
+    ys, xs = window(content)
+    n, region = fill_where(arr[ys, xs], lambda a: a[..., 3] == 0, (*bg_color, 0))
+    filled += n
+    changed = union(changed, offset(region, xs.start, ys.start))
 
-def peel_and_recolor_edge(
+    result = {
+        "path": str(path),
+        "filled_pixels": filled,
+        "mode": "fill-transparent",
+        "region": _as_list(changed),
+    }
+    return result, _save_png
+
+
+def _peel_and_recolor_edge_op(
+    arr: np.ndarray,
     path: Path,
+    ctx: dict,
     bg_color: tuple[int, int, int],
     iterations: int = 15,
     threshold: int = 130,
-) -> dict:
-    """A more aggressive way to remove white edges:
-    1. Temporarily treat the specific background color as transparent.
-    2. Peel off near-white/light-gray pixels that are adjacent to transparency.
-    3. Fill transparency back with the background color.
-    """
-    img = Image.open(path)
-    img_rgba = img.convert("RGBA")
-    width, height = img_rgba.size
-    px = img_rgba.load()
+) -> tuple[dict, Saver | None]:
+    alpha = arr[..., 3]
 
     # Step 1: Flood fill the background color to transparency from corners
-    to_transparent: list[tuple[int, int]] = []
-    visited = bytearray(width * height)
-    q: deque[tuple[int, int]] = deque()
-
-    # Corner seeds
-    for start_pos in [(0, 0), (width - 1, 0), (0, height - 1), (width - 1, height - 1)]:
-        sx, sy = start_pos
-        idx = sy * width + sx
-        if not visited[idx]:
-            r, g, b, a = px[sx, sy]
-            if (r, g, b) == bg_color:
-                q.append((sx, sy))
-                visited[idx] = 1
-
-    neighbors = ((-1, 0), (1, 0), (0, -1), (0, 1))
-    while q:
-        cx, cy = q.popleft()
-        r, g, b, a = px[cx, cy]
-        px[cx, cy] = (r, g, b, 0)  # Make it transparent temporarily
-
-        for dx, dy in neighbors:
-            nx, ny = cx + dx, cy + dy
-            if 0 <= nx < width and 0 <= ny < height:
-                nidx = ny * width + nx
-                if not visited[nidx]:
-                    nr, ng, nb, na = px[nx, ny]
-                    if (nr, ng, nb) == bg_color:
-                        visited[nidx] = 1
-                        q.append((nx, ny))
+    is_bg = rgb_equals_mask(arr, bg_color)
+    alpha[flood_fill(is_bg, corner_seeds(is_bg), connectivity=4)] = 0
 
     # Step 2: Peel light gray edges
-    cleared_this_step = 0
-    peel_neighbors = (
-        (-1, -1),
-        (0, -1),
-        (1, -1),
-        (-1, 0),
-        (1, 0),
-        (-1, 1),
-        (0, 1),
-        (1, 1),
-    )
-
-    for _ in range(iterations):
-        to_clear = []
-        for y in range(height):
-            for x in range(width):
-                r, g, b, a = px[x, y]
-                if a == 0:
-                    continue
-
-                if r >= threshold and g >= threshold and b >= threshold:
-                    for dx, dy in peel_neighbors:
-                        nx, ny = x + dx, y + dy
-                        if 0 <= nx < width and 0 <= ny < height:
-                            if px[nx, ny][3] == 0:
-                                to_clear.append((x, y))
-                                break
-        if not to_clear:
-            break
-        for tx, ty in to_clear:
-            px[tx, ty] = (*bg_color, 0)
-        cleared_this_step += len(to_clear)
+    light = channel_min(arr) >= threshold
+    peeled, _ = peel_mask(light & (alpha != 0), alpha == 0, iterations)
+    arr[peeled] = (*bg_color, 0)
+    cleared_this_step = int(np.count_nonzero(peeled))
 
     # Step 3: Fill all transparency back with bg_color (solid)
-    for y in range(height):
-        for x in range(width):
-            if px[x, y][3] == 0:
-                px[x, y] = (*bg_color, 255)
+    _, changed = fill_where(arr, lambda a: a[..., 3] == 0, (*bg_color, 255))
+    # Saved as RGB, so later stages see every pixel as opaque
+    alpha[:] = 255
+    ctx["content"] = (0, 0, arr.shape[1], arr.shape[0])
 
-    img_rgba.convert("RGB").save(path, format="PNG", optimize=True)
-    return {
+    result = {
         "path": str(path),
         "cleared_pixels": cleared_this_step,
         "mode": "peel-and-recolor",
+        "region": _as_list(changed),
     }
+    return result, _save_png_rgb
 
 
-def peel_light_gray_border_transparent(
+def _peel_light_gray_border_transparent_op(
+    arr: np.ndarray,
     path: Path,
+    ctx: dict,
     *,
     iterations: int = 6,
     min_value: int = 160,
     max_delta: int = 80,
     min_alpha: int = 20,
     neighbor_alpha: int = 8,
-) -> dict:
-    """Remove a thin light-gray border by repeatedly clearing pixels that touch transparency.
-
-    This targets faint outlines that are not a single connected component (e.g., antialiased
-    rings around a logo). It only clears pixels that are both light-gray-ish and adjacent to
-    already-transparent pixels.
-    """
-
-    img = Image.open(path)
-    img_rgba = img.convert("RGBA")
-    width, height = img_rgba.size
-    px = img_rgba.load()
-
-    # Limit work to the alpha bounding box (fast on large images)
-    alpha = img_rgba.split()[3]
-    bbox = alpha.getbbox()  # (left, upper, right, lower) or None
-    if bbox is None:
-        return {
-            "path": str(path),
-            "size": f"{width}x{height}",
-            "cleared_pixels": 0,
-            "iterations": 0,
-            "min_value": min_value,
-            "max_delta": max_delta,
-            "min_alpha": min_alpha,
-            "format": "PNG" if path.suffix.lower() != ".webp" else "WEBP",
-            "mode": "peel-light-gray",
-        }
-
-    left, upper, right, lower = bbox
-    # Expand by 1px so we can detect adjacency to transparency properly
-    left = max(0, left - 1)
-    upper = max(0, upper - 1)
-    right = min(width, right + 1)
-    lower = min(height, lower + 1)
-
-    neighbors = (
-        (-1, -1),
-        (0, -1),
-        (1, -1),
-        (-1, 0),
-        (1, 0),
-        (-1, 1),
-        (0, 1),
-        (1, 1),
+) -> tuple[dict, Saver | None]:
+    height, width = arr.shape[:2]
+    peeled = _peel_light_gray(
+        arr,
+        ctx,
+        iterations=iterations,
+        min_value=min_value,
+        max_delta=max_delta,
+        min_alpha=min_alpha,
+        neighbor_alpha=neighbor_alpha,
     )
+    cleared_total, it_done, changed = peeled or (0, 0, None)
 
-    cleared_total = 0
-    it_done = 0
-
-    for _ in range(iterations):
-        it_done += 1
-        to_clear: list[tuple[int, int]] = []
-
-        for y in range(upper, lower):
-            for x in range(left, right):
-                r, g, b, a = px[x, y]
-                if a < min_alpha:
-                    continue
-                if not _is_light_gray(
-                    r,
-                    g,
-                    b,
-                    a,
-                    min_value=min_value,
-                    max_delta=max_delta,
-                    min_alpha=min_alpha,
-                ):
-                    continue
-
-                # Only peel if this pixel touches transparency
-                touches_transparent = False
-                for dx, dy in neighbors:
-                    nx = x + dx
-                    ny = y + dy
-                    if nx < 0 or nx >= width or ny < 0 or ny >= height:
-                        continue
-                    if px[nx, ny][3] <= neighbor_alpha:
-                        touches_transparent = True
-                        break
-
-                if touches_transparent:
-                    to_clear.append((x, y))
-
-        if not to_clear:
-            it_done -= 1
-            break
-
-        for x, y in to_clear:
-            r, g, b, a = px[x, y]
-            if a != 0:
-                px[x, y] = (r, g, b, 0)
-                cleared_total += 1
-
-    # Save in-place with alpha.
-    ext = path.suffix.lower()
-    if ext == ".webp":
-        img_rgba.save(path, format="WEBP", lossless=True, quality=100, method=6)
-        out_format = "WEBP"
-    else:
-        img_rgba.save(path, format="PNG", optimize=True)
-        out_format = "PNG"
-
-    return {
+    result = {
         "path": str(path),
         "size": f"{width}x{height}",
         "cleared_pixels": cleared_total,
@@ -270,406 +271,181 @@ def peel_light_gray_border_transparent(
         "min_value": min_value,
         "max_delta": max_delta,
         "min_alpha": min_alpha,
-        "format": out_format,
+        "format": _format_for(path),
         "mode": "peel-light-gray",
+        "region": _as_list(changed),
     }
+    # A fully transparent image is left untouched.
+    return result, None if peeled is None else _save_in_place
 
 
-def make_edge_white_transparent(path: Path, threshold: int = 10) -> dict:
-    img = Image.open(path)
-    img_rgba = img.convert("RGBA")
-    width, height = img_rgba.size
-    px = img_rgba.load()
-
-    visited = bytearray(width * height)
-    q: deque[tuple[int, int]] = deque()
-
-    def try_push(x: int, y: int) -> None:
-        idx = y * width + x
-        if visited[idx]:
-            return
-        r, g, b, a = px[x, y]
-        if _is_edge_white(r, g, b, a, threshold):
-            visited[idx] = 1
-            q.append((x, y))
-
-    # Seed with edge pixels that are near-white
-    for x in range(width):
-        try_push(x, 0)
-        try_push(x, height - 1)
-    for y in range(height):
-        try_push(0, y)
-        try_push(width - 1, y)
+def _edge_white_fill(
+    arr: np.ndarray, ctx: dict, threshold: int
+) -> tuple[np.ndarray, slice, slice]:
+    """Edge-connected near-white pixels as a mask over the crop arr[ys, xs].
 
-    cleared = 0
-    # 8-connected flood fill
-    neighbors = (
-        (-1, -1),
-        (0, -1),
-        (1, -1),
-        (-1, 0),
-        (1, 0),
-        (-1, 1),
-        (0, 1),
-        (1, 1),
-    )
+    Near-white requires alpha > 0, so only the content window can match.
+    """
+    content = ctx["content"] or (0, 0, 0, 0)
+    ys, xs = window(content)
+    # 8-connected flood fill seeded with edge pixels that are near-white
+    white = _is_edge_white(arr[ys, xs], threshold)
+    fill = flood_fill(white, border_seeds(white, content, arr.shape), connectivity=8)
+    return fill, ys, xs
 
-    while q:
-        x, y = q.popleft()
-        r, g, b, a = px[x, y]
-        if a != 0:
-            px[x, y] = (r, g, b, 0)
-            cleared += 1
-
-        for dx, dy in neighbors:
-            nx = x + dx
-            ny = y + dy
-            if nx < 0 or nx >= width or ny < 0 or ny >= height:
-                continue
-            idx = ny * width + nx
-            if visited[idx]:
-                continue
-            nr, ng, nb, na = px[nx, ny]
-            if _is_edge_white(nr, ng, nb, na, threshold):
-                visited[idx] = 1
-                q.append((nx, ny))
-
-    # Save in-place with alpha.
-    ext = path.suffix.lower()
-    if ext == ".webp":
-        img_rgba.save(path, format="WEBP", lossless=True, quality=100, method=6)
-    else:
-        img_rgba.save(path, format="PNG", optimize=True)
 
-    return {
+def _make_edge_white_transparent_op(
+    arr: np.ndarray, path: Path, ctx: dict, threshold: int = 10
+) -> tuple[dict, Saver | None]:
+    height, width = arr.shape[:2]
+
+    fill, ys, xs = _edge_white_fill(arr, ctx, threshold)
+    alpha = arr[ys, xs, 3]
+    cleared = int(np.count_nonzero(fill & (alpha != 0)))
+    alpha[fill] = 0
+
+    result = {
         "path": str(path),
         "size": f"{width}x{height}",
         "cleared_pixels": cleared,
         "threshold": threshold,
-        "format": "WEBP" if ext == ".webp" else "PNG",
+        "format": _format_for(path),
+        "region": _as_list(_changed(fill, ys, xs)),
     }
+    return result, _save_in_place
 
 
-def make_edge_recolor_robust(
+def _make_edge_recolor_robust_op(
+    arr: np.ndarray,
     path: Path,
+    ctx: dict,
     replacement_rgb: tuple[int, int, int],
     iterations: int = 15,
-) -> dict:
-    """Robustly remove white/light edges around a motif and fill background.
-
-    This is designed for icons with a dark background and a central motif that might
-    have an antialiased white/light ring. It makes the background transparent,
-    peels the edges of the motif, then restores the background.
-    """
-    img = Image.open(path).convert("RGBA")
-    width, height = img.size
-    px = img.load()
+) -> tuple[dict, Saver | None]:
+    height, width = arr.shape[:2]
 
     # 1. Flood fill background from corners to make it transparent
-    visited = bytearray(width * height)
-    q: deque[tuple[int, int]] = deque()
-
-    # Target color matches
-    bg_r, bg_g, bg_b = replacement_rgb
-
-    def is_target_bg(r: int, g: int, b: int) -> bool:
-        return abs(r - bg_r) < 15 and abs(g - bg_g) < 15 and abs(b - bg_b) < 15
-
-    for x in range(width):
-        for y in (0, height - 1):
-            idx = y * width + x
-            if not visited[idx] and is_target_bg(*px[x, y][:3]):
-                visited[idx] = 1
-                q.append((x, y))
-    for y in range(height):
-        for x in (0, width - 1):
-            idx = y * width + x
-            if not visited[idx] and is_target_bg(*px[x, y][:3]):
-                visited[idx] = 1
-                q.append((x, y))
-
-    while q:
-        x, y = q.popleft()
-        px[x, y] = (0, 0, 0, 0)
-        for dx, dy in ((-1, 0), (1, 0), (0, -1), (0, 1)):
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < width and 0 <= ny < height:
-                nidx = ny * width + nx
-                if not visited[nidx] and is_target_bg(*px[nx, ny][:3]):
-                    visited[nidx] = 1
-                    q.append((nx, ny))
-
-    # Save to path temporarily for peeling
-    img.save(path)
-
-    # 2. Peel light gray edges (including the white line) using existing function
-    res = peel_light_gray_border_transparent(
-        path,
+    is_bg = rgb_near_mask(arr, replacement_rgb, 15)
+    arr[flood_fill(is_bg, border_seeds(is_bg), connectivity=4)] = (0, 0, 0, 0)
+
+    # 2. Peel light gray edges (including the white line), same pass as
+    # peel_light_gray_border_transparent
+    min_value = 130  # Capture more antialiased pixels
+    max_delta = 100
+    min_alpha = 20
+    cleared, it_done, _ = _peel_light_gray(
+        arr,
+        ctx,
         iterations=iterations,
-        min_value=130,  # Capture more antialiased pixels
-        max_delta=100,
-    )
-
-    # 3. Restore background
-    img = Image.open(path).convert("RGBA")
-    bg = Image.new("RGBA", (width, height), (*replacement_rgb, 255))
-    bg.paste(img, (0, 0), img)
-
-    # Save as RGB for iOS compatibility
-    bg.convert("RGB").save(path, format="PNG", optimize=True)
-
-    res["mode"] = "robust-recolor"
-    return res
+        min_value=min_value,
+        max_delta=max_delta,
+        min_alpha=min_alpha,
+        neighbor_alpha=8,
+    ) or (0, 0, None)
+
+    # 3. Restore background (saved as RGB for iOS compatibility)
+    changed = alpha_bbox(arr[..., 3] != 255)
+    arr[...] = composite_over(arr, replacement_rgb)
+    ctx["content"] = (0, 0, width, height)
+
+    result = {
+        "path": str(path),
+        "size": f"{width}x{height}",
+        "cleared_pixels": cleared,
+        "iterations": it_done,
+        "min_value": min_value,
+        "max_delta": max_delta,
+        "min_alpha": min_alpha,
+        "format": _format_for(path),
+        "mode": "robust-recolor",
+        "region": _as_list(changed),
+    }
+    return result, _save_png_rgb
 
 
-def make_edge_white_recolor_png(
+def _make_edge_white_recolor_png_op(
+    arr: np.ndarray,
     path: Path,
+    ctx: dict,
     replacement_rgb: tuple[int, int, int],
     threshold: int = 10,
-) -> dict:
-    img = Image.open(path)
-    img_rgba = img.convert("RGBA")
-    width, height = img_rgba.size
-    px = img_rgba.load()
-
-    visited = bytearray(width * height)
-    q: deque[tuple[int, int]] = deque()
-
-    def try_push(x: int, y: int) -> None:
-        idx = y * width + x
-        if visited[idx]:
-            return
-        r, g, b, a = px[x, y]
-        if _is_edge_white(r, g, b, a, threshold):
-            visited[idx] = 1
-            q.append((x, y))
-
-    for x in range(width):
-        try_push(x, 0)
-        try_push(x, height - 1)
-    for y in range(height):
-        try_push(0, y)
-        try_push(width - 1, y)
-
-    rr, rg, rb = replacement_rgb
-    cleared = 0
-    neighbors = (
-        (-1, -1),
-        (0, -1),
-        (1, -1),
-        (-1, 0),
-        (1, 0),
-        (-1, 1),
-        (0, 1),
-        (1, 1),
-    )
+) -> tuple[dict, Saver | None]:
+    height, width = arr.shape[:2]
 
-    while q:
-        x, y = q.popleft()
-        px[x, y] = (rr, rg, rb, 255)
-        cleared += 1
-
-        for dx, dy in neighbors:
-            nx = x + dx
-            ny = y + dy
-            if nx < 0 or nx >= width or ny < 0 or ny >= height:
-                continue
-            idx = ny * width + nx
-            if visited[idx]:
-                continue
-            nr, ng, nb, na = px[nx, ny]
-            if _is_edge_white(nr, ng, nb, na, threshold):
-                visited[idx] = 1
-                q.append((nx, ny))
+    fill, ys, xs = _edge_white_fill(arr, ctx, threshold)
+    arr[ys, xs][fill] = (*replacement_rgb, 255)
+    cleared = int(np.count_nonzero(fill))
+    # Saved as RGB, so later stages see every pixel as opaque
+    arr[..., 3] = 255
+    ctx["content"] = (0, 0, width, height)
 
-    # iOS icon compatibility: save as RGB (no alpha)
-    img_rgba.convert("RGB").save(path, format="PNG", optimize=True)
-
-    return {
+    result = {
         "path": str(path),
         "size": f"{width}x{height}",
         "cleared_pixels": cleared,
         "threshold": threshold,
         "format": "PNG",
         "mode": "edge-recolor",
+        "region": _as_list(_changed(fill, ys, xs)),
     }
+    return result, _save_png_rgb
 
 
-def make_largest_near_white_component_transparent(
-    path: Path, threshold: int = 10
-) -> dict:
-    img = Image.open(path)
-    img_rgba = img.convert("RGBA")
-    width, height = img_rgba.size
-    px = img_rgba.load()
-
-    visited = bytearray(width * height)
-
+def _clear_largest(
+    arr: np.ndarray, mask: np.ndarray, ys: slice, xs: slice
+) -> tuple[int, Region | None]:
+    """Make the largest component of `mask` (over arr[ys, xs]) transparent."""
     # 8-connected
-    neighbors = (
-        (-1, -1),
-        (0, -1),
-        (1, -1),
-        (-1, 0),
-        (1, 0),
-        (-1, 1),
-        (0, 1),
-        (1, 1),
-    )
+    best_component = largest_component(mask)
+    alpha = arr[ys, xs, 3]
+    cleared = int(np.count_nonzero(best_component & (alpha != 0)))
+    alpha[best_component] = 0
+    return cleared, _changed(best_component, ys, xs)
 
-    best_component: list[int] = []
-
-    for y in range(height):
-        row_base = y * width
-        for x in range(width):
-            idx = row_base + x
-            if visited[idx]:
-                continue
-
-            r, g, b, a = px[x, y]
-            if not _is_edge_white(r, g, b, a, threshold):
-                visited[idx] = 1
-                continue
-
-            q: deque[tuple[int, int]] = deque()
-            q.append((x, y))
-            visited[idx] = 1
-            component: list[int] = [idx]
-
-            while q:
-                cx, cy = q.popleft()
-                for dx, dy in neighbors:
-                    nx = cx + dx
-                    ny = cy + dy
-                    if nx < 0 or nx >= width or ny < 0 or ny >= height:
-                        continue
-                    nidx = ny * width + nx
-                    if visited[nidx]:
-                        continue
-                    nr, ng, nb, na = px[nx, ny]
-                    if _is_edge_white(nr, ng, nb, na, threshold):
-                        visited[nidx] = 1
-                        q.append((nx, ny))
-                        component.append(nidx)
-                    else:
-                        visited[nidx] = 1
-
-            if len(component) > len(best_component):
-                best_component = component
 
-    cleared = 0
-    for idx in best_component:
-        x = idx % width
-        y = idx // width
-        r, g, b, a = px[x, y]
-        if a != 0:
-            px[x, y] = (r, g, b, 0)
-            cleared += 1
+def _make_largest_near_white_component_transparent_op(
+    arr: np.ndarray, path: Path, ctx: dict, threshold: int = 10
+) -> tuple[dict, Saver | None]:
+    height, width = arr.shape[:2]
 
-    img_rgba.save(path, format="PNG", optimize=True)
+    # Near-white requires alpha > 0: components live inside the content window.
+    ys, xs = window(ctx["content"] or (0, 0, 0, 0))
+    mask = _is_edge_white(arr[ys, xs], threshold)
+    cleared, changed = _clear_largest(arr, mask, ys, xs)
 
-    return {
+    result = {
         "path": str(path),
         "size": f"{width}x{height}",
         "cleared_pixels": cleared,
         "threshold": threshold,
         "format": "PNG",
         "mode": "largest-component",
+        "region": _as_list(changed),
     }
+    return result, _save_png
 
 
-def make_largest_light_gray_component_transparent(
+def _make_largest_light_gray_component_transparent_op(
+    arr: np.ndarray,
     path: Path,
+    ctx: dict,
     *,
     min_value: int = 160,
     max_delta: int = 80,
     min_alpha: int = 20,
-) -> dict:
-    img = Image.open(path)
-    img_rgba = img.convert("RGBA")
-    width, height = img_rgba.size
-    px = img_rgba.load()
-
-    visited = bytearray(width * height)
-    neighbors = (
-        (-1, -1),
-        (0, -1),
-        (1, -1),
-        (-1, 0),
-        (1, 0),
-        (-1, 1),
-        (0, 1),
-        (1, 1),
-    )
-
-    best_component: list[int] = []
-
-    for y in range(height):
-        row_base = y * width
-        for x in range(width):
-            idx = row_base + x
-            if visited[idx]:
-                continue
-
-            r, g, b, a = px[x, y]
-            if not _is_light_gray(
-                r,
-                g,
-                b,
-                a,
-                min_value=min_value,
-                max_delta=max_delta,
-                min_alpha=min_alpha,
-            ):
-                visited[idx] = 1
-                continue
-
-            q: deque[tuple[int, int]] = deque()
-            q.append((x, y))
-            visited[idx] = 1
-            component: list[int] = [idx]
-
-            while q:
-                cx, cy = q.popleft()
-                for dx, dy in neighbors:
-                    nx = cx + dx
-                    ny = cy + dy
-                    if nx < 0 or nx >= width or ny < 0 or ny >= height:
-                        continue
-                    nidx = ny * width + nx
-                    if visited[nidx]:
-                        continue
-                    nr, ng, nb, na = px[nx, ny]
-                    if _is_light_gray(
-                        nr,
-                        ng,
-                        nb,
-                        na,
-                        min_value=min_value,
-                        max_delta=max_delta,
-                        min_alpha=min_alpha,
-                    ):
-                        visited[nidx] = 1
-                        q.append((nx, ny))
-                        component.append(nidx)
-                    else:
-                        visited[nidx] = 1
-
-            if len(component) > len(best_component):
-                best_component = component
+) -> tuple[dict, Saver | None]:
+    height, width = arr.shape[:2]
 
-    cleared = 0
-    for idx in best_component:
-        x = idx % width
-        y = idx // width
-        r, g, b, a = px[x, y]
-        if a != 0:
-            px[x, y] = (r, g, b, 0)
-            cleared += 1
-
-    img_rgba.save(path, format="PNG", optimize=True)
+    if min_alpha > 0:
+        ys, xs = window(ctx["content"] or (0, 0, 0, 0))
+    else:
+        ys, xs = slice(0, height), slice(0, width)
+    mask = _is_light_gray(
+        arr[ys, xs], min_value=min_value, max_delta=max_delta, min_alpha=min_alpha
+    )
+    cleared, changed = _clear_largest(arr, mask, ys, xs)
 
-    return {
+    result = {
         "path": str(path),
         "size": f"{width}x{height}",
         "cleared_pixels": cleared,
@@ -678,139 +454,484 @@ def make_largest_light_gray_component_transparent(
         "min_alpha": min_alpha,
         "format": "PNG",
         "mode": "largest-light-gray",
+        "region": _as_list(changed),
     }
+    return result, _save_png
 
 
-def fix_alpha_bleeding(path: Path, replacement_rgb: tuple[int, int, int]) -> dict:
-    """Recolor fully transparent pixels to prevent color bleeding.
-
-    When images are scaled, the RGB values of transparent pixels can 'bleed' into
-    neighboring opaque pixels. If the transparent background is white, this
-    results in a faint white halo.
-    """
-    img = Image.open(path).convert("RGBA")
-    width, height = img.size
-    px = img.load()
+def _fix_alpha_bleeding_op(
+    arr: np.ndarray, path: Path, ctx: dict, replacement_rgb: tuple[int, int, int]
+) -> tuple[dict, Saver | None]:
+    height, width = arr.shape[:2]
     cleared = 0
-    for y in range(height):
-        for x in range(width):
-            r, g, b, a = px[x, y]
-            if a == 0:
-                if (r, g, b) != replacement_rgb:
-                    px[x, y] = (*replacement_rgb, 0)
-                    cleared += 1
-    if cleared > 0:
-        img.save(path, optimize=True)
-    return {
+    changed = None
+    content = ctx["content"] or (0, 0, 0, 0)
+
+    # Outside the content window every pixel is transparent; skip the alpha test there.
+    parts = [(ys, xs, False) for ys, xs in outside(content, arr.shape)]
+    parts.append((*window(content), True))
+    for ys, xs, check_alpha in parts:
+        crop = arr[ys, xs]
+        if check_alpha:
+            n, region = fill_where(
+                crop,
+                lambda a: (a[..., 3] == 0) & ~rgb_equals_mask(a, replacement_rgb),
+                (*replacement_rgb, 0),
+            )
+        else:
+            bleeding = ~rgb_equals_mask(crop, replacement_rgb)
+            n, region = int(np.count_nonzero(bleeding)), alpha_bbox(bleeding)
+            if n:
+                # Same result as a masked write, but a plain slice fill is much faster.
+                crop[...] = (*replacement_rgb, 0)
+        cleared += n
+        changed = union(changed, offset(region, xs.start, ys.start))
+
+    result = {
         "path": str(path),
         "size": f"{width}x{height}",
         "cleared_pixels": cleared,
         "format": "PNG",
         "mode": "alpha-bleeding-fix",
+        "region": _as_list(changed),
+    }
+    return result, _save_by_extension if cleared > 0 else None
+
+
+# In-memory operations by the name of the pass they implement.
+OPERATIONS: dict[str, Callable[..., tuple[dict, Saver | None]]] = {
+    "fill_transparent_with_color": _fill_transparent_with_color_op,
+    "peel_and_recolor_edge": _peel_and_recolor_edge_op,
+    "peel_light_gray_border_transparent": _peel_light_gray_border_transparent_op,
+    "make_edge_white_transparent": _make_edge_white_transparent_op,
+    "make_edge_recolor_robust": _make_edge_recolor_robust_op,
+    "make_edge_white_recolor_png": _make_edge_white_recolor_png_op,
+    "make_largest_near_white_component_transparent": (
+        _make_largest_near_white_component_transparent_op
+    ),
+    "make_largest_light_gray_component_transparent": (
+        _make_largest_light_gray_component_transparent_op
+    ),
+    "fix_alpha_bleeding": _fix_alpha_bleeding_op,
+}
+
+
+def _alpha_bleeding_untouched(path: Path, header: dict) -> dict:
+    return {
+        "path": str(path),
+        "size": f"{header['width']}x{header['height']}",
+        "cleared_pixels": 0,
+        "format": "PNG",
+        "mode": "alpha-bleeding-fix",
+        "region": None,
     }
 
 
-def main() -> None:
-    repo = Path(__file__).resolve().parents[1]
+# Passes that only touch fully transparent pixels and leave the file alone when there
+# are none, with the result they report then. When the header rules out transparency
+# they are answered from it, without decoding the image.
+ALPHA_ONLY: dict[str, Callable[[Path, dict], dict]] = {
+    "fix_alpha_bleeding": _alpha_bleeding_untouched,
+}
+
+
+def run_pipeline(
+    path: Path, stages: Sequence[Stage], *, profile: str = DEFAULT_PROFILE
+) -> list[dict]:
+    """Run several passes on one decoded buffer and encode the result once.
+
+    Each stage is (operation name, keyword arguments), where the name is one of the
+    passes in OPERATIONS, e.g. ("peel_light_gray_border_transparent", {"iterations": 15}).
+    Returns one result dict per stage, as the standalone passes would, plus "region":
+    the bounding box of the pixels the stage rewrote (None if it changed nothing) and
+    "metrics" (see instrument.py); reading and decoding count towards the first stage,
+    encoding and writing towards the stage whose encoder was used.
+    Stages see the buffer exactly as the previous stage would have written it, minus
+    any lossy intermediate WebP encode. `profile` picks the encoder settings (see
+    encode.PROFILES).
+    """
+    # Leading alpha-only stages are answered from the header when it rules out
+    # transparency; later ones may see pixels an earlier stage made transparent.
+    skipped: list[dict] = []
+    if stages and stages[0][0] in ALPHA_ONLY:
+        header = probe_header(path)
+        if header is not None and not header["alpha"]:
+            while stages and stages[0][0] in ALPHA_ONLY:
+                result = ALPHA_ONLY[stages[0][0]](path, header)
+                skipped.append({**result, "metrics": {}})
+                stages = stages[1:]
+            if not stages:
+                return skipped
+
+    with collect() as load_metrics:
+        arr = load_rgba(path)
+        # Stages share what is known about the buffer: "content" is a box holding
+        # every pixel with alpha > 0 (None when there are none). Stages whose
+        # predicates need visible pixels scan only that window; stages that make
+        # pixels opaque reset it.
+        with timed("compute"):
+            ctx = {"content": alpha_bbox(arr[..., 3])}
+    results: list[dict] = []
+    save: Saver | None = None
+    saved_by: dict = {}
+    for name, params in stages:
+        with collect() as metrics, timed("compute"):
+            result, stage_save = OPERATIONS[name](arr, path, ctx, **params)
+        result["metrics"] = metrics
+        results.append(result)
+        if stage_save is not None:
+            save, saved_by = stage_save, metrics
+    if results:
+        merge(results[0]["metrics"], load_metrics)
+    if save is not None:
+        with collect() as save_metrics:
+            save(arr, path, profile)
+        merge(saved_by, save_metrics)
+    for result in results:
+        result["metrics"] = rounded(result["metrics"])
+    return skipped + results
 
-    targets: list[Path] = []
-
-    # Source assets (used by Expo config + future regenerations)
-    targets += [
-        repo / "assets" / "images" / "icon.png",
-        repo / "assets" / "images" / "android-icon-foreground.png",
-        repo / "assets" / "images" / "splash-icon.png",
-    ]
-
-    # Generated Android resources currently used by Gradle builds
-    res = repo / "android" / "app" / "src" / "main" / "res"
-    targets += list(res.glob("drawable-*/splashscreen_logo.png"))
-    targets += list(res.glob("mipmap-*/ic_launcher*.webp"))
-
-    # De-dup + only existing files
-    uniq: list[Path] = []
-    seen: set[Path] = set()
-    for p in targets:
-        if p in seen:
-            continue
-        seen.add(p)
-        if p.exists() and p.is_file():
-            uniq.append(p)
 
-    if not uniq:
-        raise SystemExit("No target images found.")
+def fill_transparent_with_color(path: Path, bg_color: tuple[int, int, int]) -> dict:
+    """Fill fully transparent pixels with a specific solid color (solidifying the transparent area).
+    This prevents 'white bleeding' when an image with alpha is scaled or converted.
+    """
+    stage = ("fill_transparent_with_color", {"bg_color": bg_color})
+    return run_pipeline(path, [stage])[0]
+
+
+def peel_and_recolor_edge(
+    path: Path,
+    bg_color: tuple[int, int, int],
+    iterations: int = 15,
+    threshold: int = 130,
+) -> dict:
+    """A more aggressive way to remove white edges:
+    1. Temporarily treat the specific background color as transparent.
+    2. Peel off near-white/light-gray pixels that are adjacent to transparency.
+    3. Fill transparency back with the background color.
+    """
+    params = {"bg_color": bg_color, "iterations": iterations, "threshold": threshold}
+    return run_pipeline(path, [("peel_and_recolor_edge", params)])[0]
+
+
+def peel_light_gray_border_transparent(
+    path: Path,
+    *,
+    iterations: int = 6,
+    min_value: int = 160,
+    max_delta: int = 80,
+    min_alpha: int = 20,
+    neighbor_alpha: int = 8,
+) -> dict:
+    """Remove a thin light-gray border by repeatedly clearing pixels that touch transparency.
+
+    This targets faint outlines that are not a single connected component (e.g., antialiased
+    rings around a logo). It only clears pixels that are both light-gray-ish and adjacent to
+    already-transparent pixels.
+    """
+    params = {
+        "iterations": iterations,
+        "min_value": min_value,
+        "max_delta": max_delta,
+        "min_alpha": min_alpha,
+        "neighbor_alpha": neighbor_alpha,
+    }
+    return run_pipeline(path, [("peel_light_gray_border_transparent", params)])[0]
+
+
+def make_edge_white_transparent(path: Path, threshold: int = 10) -> dict:
+    params = {"threshold": threshold}
+    return run_pipeline(path, [("make_edge_white_transparent", params)])[0]
+
+
+def make_edge_recolor_robust(
+    path: Path,
+    replacement_rgb: tuple[int, int, int],
+    iterations: int = 15,
+) -> dict:
+    """Robustly remove white/light edges around a motif and fill background.
+
+    This is designed for icons with a dark background and a central motif that might
+    have an antialiased white/light ring. It makes the background transparent,
+    peels the edges of the motif, then restores the background.
+    """
+    params = {"replacement_rgb": replacement_rgb, "iterations": iterations}
+    return run_pipeline(path, [("make_edge_recolor_robust", params)])[0]
+
+
+def make_edge_white_recolor_png(
+    path: Path,
+    replacement_rgb: tuple[int, int, int],
+    threshold: int = 10,
+) -> dict:
+    params = {"replacement_rgb": replacement_rgb, "threshold": threshold}
+    return run_pipeline(path, [("make_edge_white_recolor_png", params)])[0]
+
+
+def make_largest_near_white_component_transparent(
+    path: Path, threshold: int = 10
+) -> dict:
+    stage = ("make_largest_near_white_component_transparent", {"threshold": threshold})
+    return run_pipeline(path, [stage])[0]
+
+
+def make_largest_light_gray_component_transparent(
+    path: Path,
+    *,
+    min_value: int = 160,
+    max_delta: int = 80,
+    min_alpha: int = 20,
+) -> dict:
+    params = {"min_value": min_value, "max_delta": max_delta, "min_alpha": min_alpha}
+    stage = ("make_largest_light_gray_component_transparent", params)
+    return run_pipeline(path, [stage])[0]
+
 
-    backup_root = (
-        repo / "tools" / "iconfix-backup" / _dt.datetime.now().strftime("%Y%m%d-%H%M%S")
+def fix_alpha_bleeding(path: Path, replacement_rgb: tuple[int, int, int]) -> dict:
+    """Recolor fully transparent pixels to prevent color bleeding.
+
+    When images are scaled, the RGB values of transparent pixels can 'bleed' into
+    neighboring opaque pixels. If the transparent background is white, this
+    results in a faint white halo.
+    """
+    params = {"replacement_rgb": replacement_rgb}
+    return run_pipeline(path, [("fix_alpha_bleeding", params)])[0]
+
+
+def _process_file(
+    p: Path, stages: list[Stage], profile: str, smallest: bool = False
+) -> tuple[list[dict], float, dict | None]:
+    """Fix one target; runs in a worker process when --jobs > 1."""
+    start = time.perf_counter()
+    # Each file is decoded once and its passes run back to back in memory.
+    results = run_pipeline(p, stages, profile=profile)
+    encoding = smallest_encoding(p) if smallest else None
+    return results, time.perf_counter() - start, encoding
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Remove white edges from app icons.")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        metavar="N",
+        help="process files on N worker processes (0 = one per CPU core)",
+    )
+    add_encode_options(parser)
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        metavar="JSON",
+        help="write every result with its timings and counters to this file",
     )
-    backup_root.mkdir(parents=True, exist_ok=True)
+    parser.add_argument(
+        "--profile-out",
+        type=Path,
+        metavar="PREFIX",
+        help="run under cProfile; write PREFIX.pstats and PREFIX.collapsed "
+        "(flamegraph input). Implies --jobs 1",
+    )
+    parser.add_argument(
+        "--recipes",
+        type=Path,
+        default=DEFAULT_RECIPES,
+        metavar="JSON",
+        help="recipe file mapping asset globs to passes",
+    )
+    parser.add_argument(
+        "--set", default="default", help="which rule set of the recipe file to apply"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and refix assets as they change (pair with --profile fast)",
+    )
+    add_pixel_cache_option(parser)
+    args = parser.parse_args(argv)
+
+    repo = Path(__file__).resolve().parents[1]
+    if args.pixel_cache is not None:
+        use_pixel_cache(default_cache(repo), args.pixel_cache << 20)
+
+    if not args.watch:
+        _fix_assets(args, repo)
+        return
+
+    # Decoded sources stay in memory between rounds; pool workers would not share them.
+    keep_buffers(BUFFER_BYTES)
+    args.jobs = 1
+
+    def watched() -> list[Path]:
+        recipes = load_recipes(args.recipes)
+        return [args.recipes, *(p for p, _ in match_targets(recipes, args.set, repo))]
+
+    def rebuild(changed: set[Path]) -> None:
+        # A recipe edit can affect every target.
+        _fix_assets(args, repo, None if args.recipes in changed else changed)
+
+    _fix_assets(args, repo)
+    watch(watched, rebuild)
+
+
+def _fix_assets(
+    args: argparse.Namespace, repo: Path, only: set[Path] | None = None
+) -> None:
+    """One fix run over the recipe set; with `only`, just the jobs touching those files."""
+    # Which passes run on which files comes from the recipe file; identical targets
+    # (same content, passes and format) are processed once.
+    plan = compile_plan(load_recipes(args.recipes), args.set, repo)
+    total = sum(len(job["targets"]) for job in plan)
+    if not total:
+        raise SystemExit("No target images found.")
+    if only is not None:
+        plan = [job for job in plan if only.intersection(job["targets"])]
 
-    print(f"Found {len(uniq)} images. Backing up to: {backup_root}")
+    cache = BuildCache(
+        repo / "tools" / "asset-cache" / "fix_white_edge_transparency.json",
+        repo,
+        force=args.force,
+    )
 
-    for p in uniq:
-        rel = p.relative_to(repo)
-        dst = backup_root / rel
-        dst.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(p, dst)
+    # Files are rewritten in place, so a file whose content still matches what the
+    # last run wrote (under the same recipe) needs no work.
+    todo: list[tuple[list[Stage], list[tuple[Path, dict]]]] = []
+    for job in plan:
+        stale: list[tuple[Path, dict]] = []
+        for p, recipe in zip(job["targets"], job["recipes"]):
+            recipe = {**recipe, **profile_tag(args.profile)}
+            if not cache.is_current(p, "fix", recipe):
+                stale.append((p, recipe))
+        if stale:
+            todo.append((job["stages"], stale))
+
+    if not todo:
+        print(f"All {total} images are up to date (use --force to reprocess).")
+        return
+
+    # Content-addressed: only file versions not seen before add data to the store.
+    # Restore/prune with scripts/backup_store.py.
+    store = default_store(repo)
+    paths = [p for _, stale in todo for p, _ in stale]
+    print(
+        f"Found {total} images, {len(paths)} to process in {len(todo)} jobs. "
+        f"Backing up to: {store}"
+    )
+    run_id, new_blobs = backup_files(store, repo, paths)
+    print(f"Backup run {run_id}: {new_blobs} new of {len(paths)} files stored.")
 
     print("Backup complete. Applying edge-white fixes...")
 
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.profile_out is not None:
+        # Worker processes would escape the profiler.
+        jobs = 1
+    encode = (args.profile, args.smallest)
+
+    # Files are independent, so a pool can work on several at once. Results are
+    # gathered in target order and a failing file does not stop the others.
+    outcomes: list[
+        tuple[Path, tuple[list[dict], float, dict | None] | BaseException]
+    ] = []
+    if jobs <= 1 or len(todo) <= 1:
+        with profiled(args.profile_out):
+            for stages, stale in todo:
+                p = stale[0][0]
+                try:
+                    outcomes.append((p, _process_file(p, stages, *encode)))
+                except Exception as e:  # noqa: BLE001
+                    outcomes.append((p, e))
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Workers map sources from the same pixel cache as this process, if any.
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, len(todo)),
+            initializer=None if args.pixel_cache is None else use_pixel_cache,
+            initargs=(default_cache(repo), (args.pixel_cache or 0) << 20),
+        ) as pool:
+            futures = [
+                (stale[0][0], pool.submit(_process_file, stale[0][0], stages, *encode))
+                for stages, stale in todo
+            ]
+            for p, fut in futures:
+                try:
+                    outcomes.append((p, fut.result()))
+                except Exception as e:  # noqa: BLE001
+                    outcomes.append((p, e))
+
     results: list[dict] = []
-    bg_color = (0x1F, 0x29, 0x37)  # #1f2937
-
-    for p in uniq:
-        try:
-            # Always fix alpha bleeding first for RGBA images
-            img_test = Image.open(p)
-            if img_test.mode == "RGBA":
-                results.append(fix_alpha_bleeding(p, bg_color))
-
-            if p == (repo / "assets" / "images" / "icon.png"):
-                results.append(make_edge_recolor_robust(p, bg_color, iterations=15))
-                continue
-            if p == (repo / "assets" / "images" / "splash-icon.png"):
-                # The unwanted white border is often NOT edge-connected; remove the largest near-white component.
-                results.append(make_largest_light_gray_component_transparent(p))
-                results.append(peel_light_gray_border_transparent(p, iterations=15))
-                continue
-            if p == (repo / "assets" / "images" / "android-icon-foreground.png"):
-                # Foreground should also be peeled robustly
-                results.append(
-                    peel_light_gray_border_transparent(p, iterations=15, min_value=130)
-                )
-                continue
-            if p.name == "splashscreen_logo.png":
-                results.append(make_largest_light_gray_component_transparent(p))
-                results.append(peel_light_gray_border_transparent(p, iterations=15))
-            else:
-                results.append(make_edge_white_transparent(p, threshold=10))
-        except Exception as e:  # noqa: BLE001
-            raise RuntimeError(f"Failed processing: {p}") from e
+    encodings: list[tuple[Path, dict]] = []
+    failures: list[tuple[Path, BaseException]] = []
+    copies: list[tuple[Path, Path]] = []
+    for (p, outcome), (_, stale) in zip(outcomes, todo):
+        if isinstance(outcome, BaseException):
+            failures.append((p, outcome))
+            continue
+        file_results, seconds, encoding = outcome
+        results += file_results
+        if encoding is not None:
+            encodings.append((p, encoding))
+        # Fan the output out to the targets that had the same content and recipe.
+        data = p.read_bytes()
+        for target, recipe in stale:
+            if target != p:
+                target.write_bytes(data)
+                copies.append((target, p))
+            cache.record(target, "fix", recipe, seconds=seconds, encoding=encoding)
+    cache.save()
 
     for r in results:
         mode = r.get("mode", "edge-fill")
+        changed = (
+            f"cleared={r['cleared_pixels']}"
+            if "cleared_pixels" in r
+            else f"filled={r['filled_pixels']}"
+        )
+        fmt = r.get("format", _format_for(Path(r["path"])))
+        info = " ".join(x for x in (fmt, r.get("size"), changed) if x)
+        print(f"- {os.path.relpath(r['path'], repo)}: {info} ({mode})")
+    for target, source in copies:
         print(
-            f"- {os.path.relpath(r['path'], repo)}: {r['format']} {r['size']} cleared={r['cleared_pixels']} ({mode})"
+            f"= {os.path.relpath(target, repo)}: same as "
+            f"{os.path.relpath(source, repo)}"
+        )
+    totals: dict = {}
+    for r in results:
+        merge(totals, r["metrics"])
+    phases = ("read", "decode", "compute", "encode", "write")
+    print(
+        "Time: "
+        + ", ".join(f"{ph} {totals.get(f'{ph}_seconds', 0.0):.2f}s" for ph in phases)
+        + f"; {totals.get('pixels_visited', 0)} pixels visited"
+    )
+    if args.metrics is not None:
+        report = {"totals": rounded(totals), "results": results}
+        args.metrics.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Metrics: {args.metrics}")
+    if args.profile_out is not None:
+        print(f"Profile: {args.profile_out}.pstats, {args.profile_out}.collapsed")
+    for p, e in encodings:
+        print(
+            f"~ {os.path.relpath(p, repo)}: {e['before']} -> {e['after']} bytes "
+            f"(saved {e['saved']}, {e['options'] or 'kept as written'})"
         )
 
-    print("Done.")
-
-
-def main_new() -> None:
-    repo = Path(__file__).resolve().parents[1]
-    bg_color = (31, 41, 55)
+    if failures:
+        for p, e in failures:
+            print(f"! Failed processing: {os.path.relpath(p, repo)}: {e!r}")
+        raise RuntimeError(
+            "Failed processing: " + ", ".join(str(p) for p, _ in failures)
+        ) from failures[0][1]
 
-    icon_path = repo / "assets" / "images" / "icon.png"
-    foreground_path = repo / "assets" / "images" / "android-icon-foreground.png"
+    print("Done.")
 
-    if icon_path.exists():
-        # Test with lower threshold to see if anything is caught
-        res = peel_and_recolor_edge(icon_path, bg_color, threshold=50)
-        print(f"Fixed icon.png: {res['cleared_pixels']} pixels cleared.")
 
-    if foreground_path.exists():
-        res = fill_transparent_with_color(foreground_path, bg_color)
-        print(f"Fixed foreground: {res['filled_pixels']} pixels color-filled.")
+def main_new(argv: list[str] | None = None) -> None:
+    """Recolor pass: apply the "recolor" rule set of the recipe file."""
+    main(["--set", "recolor", *(sys.argv[1:] if argv is None else argv)])
 
 
 if __name__ == "__main__":
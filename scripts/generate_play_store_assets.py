@@ -1,22 +1,340 @@
 from __future__ import annotations
 
+import argparse
+import json
+import threading
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from PIL import Image
+from build_cache import BuildCache, file_digest
+from encode import (
+    DEFAULT_PROFILE,
+    add_encode_options,
+    profile_tag,
+    save_image,
+    smallest_encoding,
+)
+from lazy import lazy_module
+from pixel_cache import add_pixel_cache_option, default_cache
+from pixel_engine import (
+    cached,
+    keep_buffers,
+    use_pixel_cache,
+    view_rgba,
+)
+from watch import BUFFER_BYTES, watch
 
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
 
-def _resize_square(input_path: Path, output_path: Path, size: int) -> None:
+# Android density buckets: launcher icons are 48dp, adaptive-icon layers 108dp.
+DENSITIES = {"mdpi": 1.0, "hdpi": 1.5, "xhdpi": 2.0, "xxhdpi": 3.0, "xxxhdpi": 4.0}
+
+# (output path relative to the repo, size, PIL mode) for every size derived from one
+# master. iOS icons must not have an alpha channel.
+ICON_OUTPUTS: list[tuple[str, int, str]] = [
+    ("store/assets/play-icon-512.png", 512, "RGBA"),
+    ("store/assets/ios-icon-1024.png", 1024, "RGB"),
+    *(
+        (f"store/assets/launcher/mipmap-{d}/ic_launcher.png", round(48 * k), "RGBA")
+        for d, k in DENSITIES.items()
+    ),
+]
+ADAPTIVE_LAYERS = {
+    "foreground": "assets/images/android-icon-foreground.png",
+    "background": "assets/images/android-icon-background.png",
+}
+
+# Feature-graphic variants (seasonal, A/B, per-locale listings) as specs with paths
+# relative to the repo; keys missing from a spec come from FEATURE_DEFAULTS. The icon
+# is scaled to icon_ratio of the height and centered.
+FEATURE_DEFAULTS = {
+    "icon": "assets/images/icon.png",
+    "background": ADAPTIVE_LAYERS["background"],
+    "width": 1024,
+    "height": 500,
+    "icon_ratio": 0.5,
+}
+FEATURE_GRAPHICS: list[dict] = [{"output": "store/assets/play-feature-1024x500.png"}]
+
+
+# Shrink-on-load: once a source is REDUCING_GAP times larger than the target, it is
+# first box-averaged by the largest such integer factor and LANCZOS only covers the
+# rest, instead of running a very wide kernel over every source pixel. Measured on
+# 8K icon masters against a direct LANCZOS resize: at most 5/255 per premultiplied
+# channel (2/255 for targets of 250 px and up), mean error below 0.15.
+REDUCING_GAP = 3.0
+# Source rows premultiplied and reduced at a time (rounded to the reduction factor).
+REDUCE_BAND_ROWS = 512
+_PREMULTIPLIED = {"LA": "La", "RGBA": "RGBa"}
+# Modes Pillow can reduce; others (palette, bilevel, 16-bit) are converted first.
+_REDUCIBLE = {"L", "LA", "La", "RGB", "RGBA", "RGBa"}
+
+
+def _reduce(
+    img: Image.Image,
+    factor: tuple[int, int],
+    box: tuple[int, int, int, int] | None = None,
+) -> Image.Image:
+    """Box-average img, cropped to `box`, by an integer factor, band by band.
+
+    Images with alpha come back premultiplied ("RGBa"/"La"); only one band at a time
+    is cropped and premultiplied, so no full-size copy is made.
+    """
+    left, top, right, bottom = box or (0, 0, *img.size)
+    fx, fy = factor
+    mode = _PREMULTIPLIED.get(img.mode, img.mode)
+    reduced = Image.new(mode, (-(-(right - left) // fx), -(-(bottom - top) // fy)))
+    step = max(1, REDUCE_BAND_ROWS // fy) * fy
+    for y in range(top, bottom, step):
+        band = img.crop((left, y, right, min(bottom, y + step))).convert(mode)
+        reduced.paste(band.reduce(factor), (0, (y - top) // fy))
+    return reduced
+
+
+def _shrink(
+    img: Image.Image,
+    size: tuple[int, int],
+    box: tuple[int, int, int, int] | None = None,
+) -> Image.Image:
+    """LANCZOS resize of img, cropped to `box` first, with integer pre-reduction.
+
+    Matches Pillow's resize(reducing_gap=REDUCING_GAP), which Pillow skips for images
+    with alpha. Targets less than REDUCING_GAP times smaller are cropped and resized
+    exactly as before.
+    """
+    left, top, right, bottom = box or (0, 0, *img.size)
+    fx = int((right - left) / size[0] / REDUCING_GAP) or 1
+    fy = int((bottom - top) / size[1] / REDUCING_GAP) or 1
+    if fx == fy == 1:
+        src = img if box is None else img.crop(box)
+        return src.resize(size, resample=Image.Resampling.LANCZOS)
+
+    reduced = _reduce(img, (fx, fy), box)
+    rest = (0, 0, (right - left) / fx, (bottom - top) / fy)
+    out = reduced.resize(size, resample=Image.Resampling.LANCZOS, box=rest)
+    return out.convert(img.mode) if out.mode != img.mode else out
+
+
+def _common_factor(dims: tuple[int, int], limit: int) -> int:
+    """Largest factor up to `limit` dividing both dimensions (at least 1)."""
+    divisors = (f for f in range(limit, 1, -1) if dims[0] % f == 0 == dims[1] % f)
+    return next(divisors, 1)
+
+
+def _reduction(src: tuple[int, int], size: tuple[int, int]) -> int:
+    """Factor to shrink a `src`-sized source by on load for a `size` target.
+
+    It divides both dimensions, so the reduced image covers exactly the same area
+    and later resizes sample the same positions as on the full source.
+    """
+    return _common_factor(
+        src, int(min(src[0] / size[0], src[1] / size[1]) / REDUCING_GAP)
+    )
+
+
+def _open_reduced(path: Path, factor: int) -> Image.Image:
+    """`path` decoded and reduced by `factor` (see _reduction()).
+
+    The source is draft-decoded where the format allows (JPEG) and reduced in its own
+    mode before any conversion, so no full-size RGBA copy exists. The result is RGB,
+    RGBA or RGBa: grayscale is widened after reducing, as Pillow cannot convert L/La
+    to RGBa directly. Unreduced sources come from view_rgba(), and so from the buffer
+    and pixel caches.
+    """
+    if factor < 2:
+        return Image.fromarray(view_rgba(path))
+    with Image.open(path) as im:
+        width = im.width
+        im.draft(None, (im.width // factor, im.height // factor))
+        # Drafting (JPEG DCT scaling) may already have done part of the reduction.
+        factor = _common_factor(im.size, factor * im.width // width)
+        if im.mode not in _REDUCIBLE:
+            im = im.convert("RGBA")
+        reduced = _reduce(im, (factor, factor)) if factor >= 2 else im.copy()
+    if reduced.mode == "La":
+        reduced = reduced.convert("LA")
+    if reduced.mode in ("L", "LA"):
+        reduced = reduced.convert("RGBA")
+    return reduced
+
+
+def _resize_square(
+    input_path: Path, output_path: Path, size: int, profile: str = DEFAULT_PROFILE
+) -> None:
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
     with Image.open(input_path) as im:
-        # Ensure consistent output (Play Console accepts PNG/JPEG)
-        im = im.convert("RGBA")
+        # JPEG masters decode at a fraction of their size; other formats ignore this.
+        im.draft(None, (size, size))
+        if im.mode not in _REDUCIBLE:
+            im = im.convert("RGBA")
+
+        # High quality downscale, then convert the small image only
+        im = _shrink(im, (size, size))
+
+        # Ensure consistent output (Play Console accepts PNG/JPEG); keep alpha if present
+        save_image(im.convert("RGBA"), output_path, "PNG", profile, optimize=True)
+
+
+def _pyramid_sources(sizes: Sequence[int]) -> dict[int, int | None]:
+    """Which level each size is resized from (None: the master).
+
+    A level is derived from the smallest larger level at least twice its size, so
+    every LANCZOS step is a real reduction and quality matches a direct resize.
+    """
+    levels = sorted(set(sizes))
+    return {s: next((t for t in levels if t >= 2 * s), None) for s in levels}
+
+
+def _resize_fanout(
+    input_path: Path,
+    outputs: Sequence[tuple[Path, int, str]],
+    pyramid: Sequence[int] = (),
+    profile: str = DEFAULT_PROFILE,
+) -> dict[Path, float]:
+    """Write several square sizes of one image, decoding it only once.
+
+    Sizes are built largest first as a downscale pyramid over `pyramid` (default: the
+    output sizes), in premultiplied alpha ("RGBa") so no level pays for, or rounds
+    through, an unpremultiply. Passing the full size list when only some outputs are
+    stale keeps their pixels identical to a full rebuild. Large steps shrink on load
+    (see _shrink). Outputs are encoded on a thread pool. Returns the seconds spent on
+    each output.
+    """
+    sources = _pyramid_sources([*pyramid, *(size for _, size, _ in outputs)])
+    with Image.open(input_path) as im:
+        factor = _reduction(im.size, (max(sources),) * 2)
+    master = _open_reduced(input_path, factor).convert("RGBa")
+    needed: set[int] = set()
+    for _, size, _ in outputs:
+        while size is not None and size not in needed:
+            needed.add(size)
+            size = sources[size]
+
+    levels: dict[int, Image.Image] = {}
+    resize_seconds: dict[int, float] = {}
+    for size in sorted(needed, reverse=True):
+        start = time.perf_counter()
+        src = master if sources[size] is None else levels[sources[size]]
+        levels[size] = _shrink(src, (size, size))
+        resize_seconds[size] = time.perf_counter() - start
+
+    def encode(path: Path, size: int, mode: str) -> float:
+        start = time.perf_counter()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        img = levels[size].convert("RGBA").convert(mode)
+        save_image(img, path, "PNG", profile, optimize=True)
+        return resize_seconds[size] + time.perf_counter() - start
+
+    # Pillow releases the GIL while converting and compressing.
+    with ThreadPoolExecutor() as pool:
+        futures = {p: pool.submit(encode, p, size, mode) for p, size, mode in outputs}
+        return {p: fut.result() for p, fut in futures.items()}
 
-        # High quality downscale
-        im = im.resize((size, size), resample=Image.Resampling.LANCZOS)
 
-        # Keep alpha if present
-        im.save(output_path, format="PNG", optimize=True)
+def _cover_background(bg: Image.Image, width: int, height: int) -> np.ndarray:
+    """The background cropped to width:height (cover style) and resized to fit."""
+    bg_ratio = bg.width / bg.height
+    target_ratio = width / height
+
+    if bg_ratio > target_ratio:
+        # Source is wider, crop left/right
+        new_width = int(bg.height * target_ratio)
+        offset = (bg.width - new_width) // 2
+        box = (offset, 0, offset + new_width, bg.height)
+    else:
+        # Source is taller, crop top/bottom
+        new_height = int(bg.width / target_ratio)
+        offset = (bg.height - new_height) // 2
+        box = (0, offset, bg.width, offset + new_height)
+
+    return np.asarray(_shrink(bg, (width, height), box))
+
+
+def _scaled_icon(icon: Image.Image, size: int) -> np.ndarray:
+    return np.asarray(_shrink(icon, (size, size)))
+
+
+def feature_specs(specs: Sequence[dict], repo_root: Path) -> list[dict]:
+    """Fill in FEATURE_DEFAULTS and resolve the paths of feature-graphic specs."""
+    full = []
+    for spec in specs:
+        spec = {**FEATURE_DEFAULTS, **spec}
+        for key in ("output", "icon", "background"):
+            spec[key] = repo_root / spec[key]
+        full.append(spec)
+    return full
+
+
+def render_feature_graphics(
+    specs: Sequence[dict], profile: str = DEFAULT_PROFILE
+) -> dict[Path, float]:
+    """Render feature-graphic variants in parallel. Returns the seconds per output.
+
+    `specs` are complete (see feature_specs()). Each layer, the background
+    cover-crop per (content hash, width, height) and the scaled icon per (content
+    hash, icon size), is built once and shared by every variant using it; sources are
+    decoded once, and only if a layer needs them. With the buffer cache on (--watch)
+    layers also survive between calls, so changing only the icon or only the
+    background redoes just that half.
+    """
+    digests = {
+        p: file_digest(p) for spec in specs for p in (spec["icon"], spec["background"])
+    }
+    decoded: dict[tuple[Path, int], Image.Image] = {}
+    decode_lock = threading.Lock()
+
+    def source(path: Path, size: tuple[int, int]) -> Image.Image:
+        # Huge sources shrink on load, by a factor that only depends on the layer's
+        # own size, so a layer's pixels do not depend on the other variants.
+        with decode_lock:
+            with Image.open(path) as im:
+                factor = _reduction(im.size, size)
+            if (path, factor) not in decoded:
+                decoded[path, factor] = _open_reduced(path, factor).convert("RGBA")
+            return decoded[path, factor]
+
+    def layer_keys(spec: dict) -> tuple[tuple, tuple]:
+        w, h = spec["width"], spec["height"]
+        size = int(h * spec["icon_ratio"])
+        bg_key = ("feature-bg", digests[spec["background"]], w, h)
+        icon_key = ("feature-icon", digests[spec["icon"]], size)
+        return bg_key, icon_key
+
+    builders: dict[tuple, tuple] = {}
+    for spec in specs:
+        bg_key, icon_key = layer_keys(spec)
+        w, h, size = *bg_key[2:], icon_key[2]
+        builders[bg_key] = (_cover_background, spec["background"], (w, h), w, h)
+        builders[icon_key] = (_scaled_icon, spec["icon"], (size, size), size)
+
+    def build(key: tuple) -> np.ndarray:
+        func, path, need, *args = builders[key]
+        return cached(key, lambda: func(source(path, need), *args))
+
+    def render(spec: dict) -> float:
+        start = time.perf_counter()
+        bg_key, icon_key = layer_keys(spec)
+        canvas = Image.fromarray(layers[bg_key]).copy()
+        icon = Image.fromarray(layers[icon_key])
+        # Paste icon in the center
+        pos = ((canvas.width - icon.width) // 2, (canvas.height - icon.height) // 2)
+        canvas.alpha_composite(icon, pos)
+
+        # Save as PNG (Play Console allows up to 15MB)
+        spec["output"].parent.mkdir(parents=True, exist_ok=True)
+        save_image(canvas, spec["output"], "PNG", profile, optimize=True)
+        return time.perf_counter() - start
+
+    # Layers first, then one task per variant to composite and encode; Pillow
+    # releases the GIL while resizing and compressing.
+    with ThreadPoolExecutor() as pool:
+        layers = dict(zip(builders, pool.map(build, builders)))
+        futures = {spec["output"]: pool.submit(render, spec) for spec in specs}
+        return {out: fut.result() for out, fut in futures.items()}
 
 
 def _generate_feature_graphic(
@@ -25,65 +343,157 @@ def _generate_feature_graphic(
     output_path: Path,
     width: int = 1024,
     height: int = 500,
+    profile: str = DEFAULT_PROFILE,
 ) -> None:
-    output_path.parent.mkdir(parents=True, exist_ok=True)
+    spec = {
+        **FEATURE_DEFAULTS,
+        "output": output_path,
+        "icon": icon_path,
+        "background": bg_path,
+        "width": width,
+        "height": height,
+    }
+    render_feature_graphics([spec], profile)
 
-    with Image.open(bg_path) as bg, Image.open(icon_path) as icon:
-        bg = bg.convert("RGBA")
-        icon = icon.convert("RGBA")
 
-        # Resize background to 1024x500 (cover style)
-        bg_ratio = bg.width / bg.height
-        target_ratio = width / height
-
-        if bg_ratio > target_ratio:
-            # Source is wider, crop left/right
-            new_width = int(bg.height * target_ratio)
-            offset = (bg.width - new_width) // 2
-            bg = bg.crop((offset, 0, offset + new_width, bg.height))
-        else:
-            # Source is taller, crop top/bottom
-            new_height = int(bg.width / target_ratio)
-            offset = (bg.height - new_height) // 2
-            bg = bg.crop((0, offset, bg.width, offset + new_height))
-
-        bg = bg.resize((width, height), resample=Image.Resampling.LANCZOS)
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate Play Store listing assets.")
+    add_encode_options(parser)
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and rebuild outputs as their sources change",
+    )
+    add_pixel_cache_option(parser)
+    parser.add_argument(
+        "--features",
+        type=Path,
+        metavar="JSON",
+        help="feature-graphic variants to render: a list of specs with an output "
+        'path and any of "icon", "background", "width", "height", "icon_ratio"',
+    )
+    args = parser.parse_args(argv)
+    repo_root = Path(__file__).resolve().parents[1]
+    args.features = (
+        FEATURE_GRAPHICS
+        if args.features is None
+        else json.loads(args.features.read_text(encoding="utf-8"))
+    )
+    if args.pixel_cache is not None:
+        use_pixel_cache(default_cache(repo_root), args.pixel_cache << 20)
 
-        # Resize icon to fit in the feature graphic (e.g., 40% of height)
-        icon_size = int(height * 0.5)
-        icon = icon.resize((icon_size, icon_size), resample=Image.Resampling.LANCZOS)
+    if not args.watch:
+        _generate(args, repo_root)
+        return
 
-        # Paste icon in the center
-        pos = ((width - icon_size) // 2, (height - icon_size) // 2)
-        bg.alpha_composite(icon, pos)
+    # Decoded masters and feature-graphic layers stay in memory between rounds.
+    keep_buffers(BUFFER_BYTES)
+    sources = [
+        repo_root / rel for rel in ("assets/images/icon.png", *ADAPTIVE_LAYERS.values())
+    ]
+    for spec in feature_specs(args.features, repo_root):
+        sources += [p for p in (spec["icon"], spec["background"]) if p not in sources]
+    _generate(args, repo_root)
+    watch(lambda: sources, lambda changed: _generate(args, repo_root, changed))
 
-        # Save as PNG (Play Console allows up to 15MB)
-        bg.save(output_path, format="PNG", optimize=True)
 
+def _generate(
+    args: argparse.Namespace, repo_root: Path, only: set[Path] | None = None
+) -> None:
+    """Build every stale output; with `only`, just those depending on these files."""
+    tag = profile_tag(args.profile)
 
-def main() -> None:
-    repo_root = Path(__file__).resolve().parents[1]
+    def wrote(path: Path) -> dict | None:
+        encoding = smallest_encoding(path) if args.smallest else None
+        size_kb = path.stat().st_size / 1024
+        note = f", saved {encoding['saved']} bytes" if encoding else ""
+        print(f"Wrote: {path} ({size_kb:.1f} KB{note})")
+        return encoding
 
     src_icon = repo_root / "assets" / "images" / "icon.png"
-    src_bg = repo_root / "assets" / "images" / "android-icon-background.png"
-    out_icon = repo_root / "store" / "assets" / "play-icon-512.png"
-    out_feature = repo_root / "store" / "assets" / "play-feature-1024x500.png"
 
     if not src_icon.exists():
         raise SystemExit(f"Not found: {src_icon}")
 
-    # Generate 512x512 icon
-    _resize_square(src_icon, out_icon, 512)
-    size_kb = out_icon.stat().st_size / 1024
-    print(f"Wrote: {out_icon} ({size_kb:.1f} KB)")
+    cache = BuildCache(
+        repo_root / "tools" / "asset-cache" / "generate_play_store_assets.json",
+        repo_root,
+        force=args.force,
+    )
 
-    # Generate feature graphic
-    if src_bg.exists():
-        _generate_feature_graphic(src_icon, src_bg, out_feature)
-        size_kb = out_feature.stat().st_size / 1024
-        print(f"Wrote: {out_feature} ({size_kb:.1f} KB)")
-    else:
-        print(f"Skipped feature graphic: {src_bg} not found")
+    # Launcher, store and iOS icons from the icon master, adaptive-icon layers from
+    # their own masters; each master is decoded once for all of its sizes.
+    jobs: list[tuple[Path, list[tuple[Path, int, str]]]] = [
+        (src_icon, [(repo_root / rel, size, mode) for rel, size, mode in ICON_OUTPUTS])
+    ]
+    for layer, rel in ADAPTIVE_LAYERS.items():
+        outputs = [
+            (
+                repo_root / f"store/assets/launcher/mipmap-{d}/ic_launcher_{layer}.png",
+                round(108 * k),
+                "RGBA",
+            )
+            for d, k in DENSITIES.items()
+        ]
+        jobs.append((repo_root / rel, outputs))
+
+    for src, outputs in jobs:
+        if only is not None and src not in only:
+            continue
+        if not src.exists():
+            print(f"Skipped {src.name} sizes: {src} not found")
+            continue
+        stale: dict[Path, tuple[int, str]] = {}
+        for p, size, mode in outputs:
+            params = {"size": size, "mode": mode, **tag}
+            if cache.is_current(p, "resize_pyramid", params, [src]):
+                print(f"Up to date: {p}")
+            else:
+                stale[p] = (size, mode)
+        if not stale:
+            continue
+
+        pyramid = [size for _, size, _ in outputs]
+        todo = [(p, size, mode) for p, (size, mode) in stale.items()]
+        written = _resize_fanout(src, todo, pyramid, args.profile)
+        for p, seconds in written.items():
+            size, mode = stale[p]
+            params = {"size": size, "mode": mode, **tag}
+            encoding = wrote(p)
+            cache.record(
+                p, "resize_pyramid", params, [src], seconds=seconds, encoding=encoding
+            )
+
+    # Feature graphics: the stale variants render as one batch, sharing layers.
+    todo: list[tuple[dict, dict]] = []
+    for spec in feature_specs(args.features, repo_root):
+        inputs = [spec["icon"], spec["background"]]
+        if only is not None and not only.intersection(inputs):
+            continue  # neither input changed
+        missing = next((p for p in inputs if not p.exists()), None)
+        if missing is not None:
+            print(f"Skipped feature graphic: {missing} not found")
+            continue
+        params = {k: spec[k] for k in ("width", "height", "icon_ratio")} | tag
+        if cache.is_current(spec["output"], "feature_graphic", params, inputs):
+            print(f"Up to date: {spec['output']}")
+        else:
+            todo.append((spec, params))
+    if todo:
+        written = render_feature_graphics([spec for spec, _ in todo], args.profile)
+        for spec, params in todo:
+            out = spec["output"]
+            inputs = [spec["icon"], spec["background"]]
+            cache.record(
+                out,
+                "feature_graphic",
+                params,
+                inputs,
+                seconds=written[out],
+                encoding=wrote(out),
+            )
+
+    cache.save()
 
 
 if __name__ == "__main__":
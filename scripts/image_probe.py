@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+
+from lazy import lazy_module
+
+Image = lazy_module("PIL.Image")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# PNG colour type -> PIL mode (bit depth only matters for grayscale).
+_PNG_MODES = {2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+
+
+def _probe_png(f) -> dict | None:
+    length, kind = struct.unpack(">I4s", f.read(8))
+    if kind != b"IHDR" or length < 13:
+        return None
+    width, height, depth, color = struct.unpack(">IIBB", f.read(10))
+    if color == 0:
+        mode = {1: "1", 16: "I;16"}.get(depth, "L")
+    else:
+        mode = _PNG_MODES.get(color)
+    if mode is None:
+        return None
+
+    # Palette and grayscale/RGB images can still carry transparency in a tRNS chunk,
+    # which always comes before the first IDAT.
+    alpha = color in (4, 6)
+    f.seek(length - 10 + 4, 1)  # rest of IHDR + CRC
+    while not alpha:
+        head = f.read(8)
+        if len(head) < 8:
+            break
+        length, kind = struct.unpack(">I4s", head)
+        if kind in (b"IDAT", b"IEND"):
+            break
+        alpha = kind == b"tRNS"
+        f.seek(length + 4, 1)
+
+    return {
+        "format": "PNG",
+        "lossless": True,
+        "width": width,
+        "height": height,
+        "mode": mode,
+        "alpha": alpha,
+    }
+
+
+def _probe_webp(f) -> dict | None:
+    kind = f.read(4)
+    data = f.read(4 + 10)[4:]  # skip the chunk size
+    if len(data) < 10:
+        return None
+    lossless = kind == b"VP8L"
+    if kind == b"VP8X":
+        alpha = bool(data[0] & 0x10)
+        width = int.from_bytes(data[4:7], "little") + 1
+        height = int.from_bytes(data[7:10], "little") + 1
+        # The bitstream chunk follows the optional ICCP/ANIM/ALPH chunks.
+        while head := f.read(8):
+            kind, length = struct.unpack("<4sI", head)
+            if kind in (b"VP8 ", b"VP8L", b"ANMF"):
+                lossless = kind == b"VP8L"
+                break
+            f.seek(length + (length & 1), 1)
+    elif kind == b"VP8L":
+        if data[0] != 0x2F:
+            return None
+        bits = int.from_bytes(data[1:5], "little")
+        width = (bits & 0x3FFF) + 1
+        height = ((bits >> 14) & 0x3FFF) + 1
+        alpha = bool(bits >> 28 & 1)
+    elif kind == b"VP8 ":
+        if data[3:6] != b"\x9d\x01\x2a":
+            return None
+        width = int.from_bytes(data[6:8], "little") & 0x3FFF
+        height = int.from_bytes(data[8:10], "little") & 0x3FFF
+        alpha = False
+    else:
+        return None
+    mode = "RGBA" if alpha else "RGB"
+    return {
+        "format": "WEBP",
+        "lossless": lossless,
+        "width": width,
+        "height": height,
+        "mode": mode,
+        "alpha": alpha,
+    }
+
+
+def probe_header(path: Path) -> dict | None:
+    """Read format, size, PIL mode and alpha presence from a PNG/WebP header.
+
+    Only the first few chunks are read, and no pixel data is decoded. "alpha" means
+    the file can hold transparent pixels (an alpha channel, a tRNS chunk or the WebP
+    alpha flag); "lossless" is False for VP8 (lossy) WebP. Returns None for other
+    formats or headers it does not understand.
+    """
+    with open(path, "rb") as f:
+        head = f.read(12)
+        try:
+            if head[:8] == PNG_SIGNATURE:
+                f.seek(8)
+                return _probe_png(f)
+            if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+                return _probe_webp(f)
+        except struct.error:  # truncated header
+            return None
+    return None
+
+
+def image_mode(path: Path) -> str:
+    """PIL mode of an image, from its header when possible."""
+    header = probe_header(path)
+    if header is not None:
+        return header["mode"]
+    with Image.open(path) as im:
+        return im.mode
@@ -0,0 +1,145 @@
+"""Counters, timers and profiling hooks for the asset scripts.
+
+Metrics are only gathered inside collect(); elsewhere the hooks return immediately,
+so the pixel kernels can call them unconditionally. Keys are flat:
+
+    <phase>_seconds   read / decode / compute / encode / write time
+    pixels_visited    pixels scanned by the mask and fill kernels
+    <name>_peak       high-water marks, e.g. flood_queue_peak (queued runs)
+"""
+
+from __future__ import annotations
+
+import contextlib
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from pathlib import Path
+
+from lazy import lazy_module
+
+# Only needed with --profile-out.
+cProfile = lazy_module("cProfile")
+pstats = lazy_module("pstats")
+
+_active: dict | None = None
+
+
+@contextlib.contextmanager
+def collect() -> Iterator[dict]:
+    """Gather metrics from the enclosed code into the yielded dict (nestable)."""
+    global _active
+    outer = _active
+    _active = {}
+    try:
+        yield _active
+    finally:
+        inner = _active
+        _active = outer
+        if outer is not None:
+            merge(outer, inner)
+
+
+def merge(into: dict, metrics: dict) -> dict:
+    """Add `metrics` into `into`: sums for counters and times, maxima for peaks."""
+    for key, value in metrics.items():
+        if key.endswith("_peak"):
+            into[key] = max(into.get(key, 0), value)
+        else:
+            into[key] = into.get(key, 0) + value
+    return into
+
+
+def count(key: str, n: int) -> None:
+    if _active is not None:
+        _active[key] = _active.get(key, 0) + n
+
+
+def peak(key: str, n: int) -> None:
+    if _active is not None and n > _active.get(key, 0):
+        _active[key] = n
+
+
+@contextlib.contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the wall time of the block to `<phase>_seconds`."""
+    if _active is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        count(f"{phase}_seconds", time.perf_counter() - start)
+
+
+def rounded(metrics: dict) -> dict:
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in metrics.items()}
+
+
+def _frame_name(func: tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":  # built-in
+        return name
+    return f"{Path(filename).stem}:{name}:{line}"
+
+
+def collapsed_stacks(stats: pstats.Stats) -> list[str]:
+    """Flamegraph "collapsed" lines (frame;frame;frame microseconds) from pstats.
+
+    cProfile keeps caller -> callee edges rather than full stacks, so each stack is
+    rebuilt by walking edges from the roots and attributing the time recorded on each
+    edge; recursive edges are cut. Good enough to see which path dominates.
+    """
+    totals = {func: (tt, ct) for func, (_, _, tt, ct, _) in stats.stats.items()}
+    callees: dict[tuple, list[tuple[tuple, float]]] = defaultdict(list)
+    roots = []
+    for func, (*_, callers) in stats.stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            callees[caller].append((func, edge[3]))
+
+    lines: list[str] = []
+
+    # `share` is the fraction of func's recorded time that belongs to this stack.
+    def walk(func: tuple, stack: list[str], share: float) -> None:
+        tt, ct = totals[func]
+        if ct * share < 1e-5:  # below 10us: not worth a frame, and keeps this linear
+            return
+        stack = [*stack, _frame_name(func)]
+        if (us := round(tt * share * 1e6)) > 0:
+            lines.append(f"{';'.join(stack)} {us}")
+        for child, edge_ct in callees.get(func, ()):
+            child_ct = totals[child][1]
+            if _frame_name(child) in stack or edge_ct <= 0 or child_ct <= 0:
+                continue
+            walk(child, stack, min(1.0, edge_ct * share / child_ct))
+
+    for func in roots:
+        walk(func, [], 1.0)
+    return lines
+
+
+@contextlib.contextmanager
+def profiled(out: Path | None) -> Iterator[None]:
+    """Run the block under cProfile and write `<out>.pstats` and `<out>.collapsed`.
+
+    With out=None this does nothing. Only the calling thread is profiled; time spent
+    in worker threads shows up as waiting in the caller.
+    """
+    if out is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        out.parent.mkdir(parents=True, exist_ok=True)
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(out.with_name(out.name + ".pstats"))
+        out.with_name(out.name + ".collapsed").write_text(
+            "\n".join(collapsed_stacks(stats)) + "\n", encoding="utf-8"
+        )
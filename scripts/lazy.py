@@ -0,0 +1,26 @@
+"""Deferred imports of heavy dependencies.
+
+    np = lazy_module("numpy")
+
+binds a stand-in that imports the real module on its first attribute access. Runs that
+never touch pixels (--help, up-to-date builds) then skip importing numpy and Pillow,
+which is most of the scripts' start-up time. Resolved attributes are copied onto the
+stand-in, so later lookups are as cheap as on the module itself.
+"""
+
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+
+
+class _LazyModule(ModuleType):
+    def __getattr__(self, attr: str):
+        value = getattr(importlib.import_module(self.__name__), attr)
+        setattr(self, attr, value)
+        return value
+
+
+def lazy_module(name: str) -> ModuleType:
+    """`name`, imported when one of its attributes is first used."""
+    return _LazyModule(name)
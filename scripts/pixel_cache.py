@@ -0,0 +1,115 @@
+"""On-disk cache of decoded pixels, shared by the asset scripts.
+
+Layout under the cache root (tools/asset-cache/pixels/):
+
+    <2 hex>/<sha256>.npy   (H, W, 4) uint8 RGBA decode of a file with that content
+
+Entries are plain .npy files, so a hit memory-maps the pixels instead of inflating the
+PNG/WebP again; pages are read from disk as they are touched. Keys are content hashes,
+so a master decoded by one script is a hit for the others, and an edited file simply
+gets a new entry. The least recently used entries are deleted once the cache is larger
+than its limit.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+from collections.abc import Callable
+from pathlib import Path
+
+from build_cache import file_digest
+from instrument import count, timed
+from lazy import lazy_module
+
+np = lazy_module("numpy")
+
+DEFAULT_MAX_MB = 1024
+
+
+def default_cache(repo: Path) -> Path:
+    return repo / "tools" / "asset-cache" / "pixels"
+
+
+def add_pixel_cache_option(parser: argparse.ArgumentParser) -> None:
+    """--pixel-cache [MB]: None when absent, the size limit in MB otherwise."""
+    parser.add_argument(
+        "--pixel-cache",
+        type=int,
+        nargs="?",
+        const=DEFAULT_MAX_MB,
+        metavar="MB",
+        help="map decoded images from tools/asset-cache/pixels, shared with the "
+        f"other asset scripts (default limit {DEFAULT_MAX_MB} MB)",
+    )
+
+
+class PixelCache:
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_MB << 20) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def entry(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.npy"
+
+    def load(
+        self,
+        path: Path,
+        decode: Callable[[Path], np.ndarray],
+        *,
+        writable: bool = False,
+    ) -> np.ndarray:
+        """The RGBA pixels of `path`, mapped from the cache or decoded and stored.
+
+        Hits are read-only maps, or copy-on-write maps with writable=True: writes
+        stay private to the process and never reach the cache file.
+        """
+        with timed("read"):
+            digest = file_digest(path)
+        entry = self.entry(digest)
+        try:
+            with timed("read"):
+                arr = np.load(entry, mmap_mode="c" if writable else "r")
+            os.utime(entry)  # recency for eviction
+        except (OSError, ValueError):
+            arr = decode(path)
+            if arr.nbytes <= self.max_bytes:
+                self.store(digest, arr)
+            return arr
+        count("pixel_cache_hits", 1)
+        return np.asarray(arr)
+
+    def store(self, digest: str, arr: np.ndarray) -> None:
+        entry = self.entry(digest)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per thread, so concurrent writers never share a temp file.
+        tmp = entry.with_name(f"{entry.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+        with timed("cache_write"):
+            with open(tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(arr))
+            os.replace(tmp, entry)
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete least recently used entries until the cache fits. Returns how many."""
+        entries = []
+        for p in self.root.glob("*/*.npy"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                # Mapped by another process (Windows) or already gone.
+                continue
+            total -= size
+            removed += 1
+        return removed
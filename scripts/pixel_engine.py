@@ -0,0 +1,578 @@
+from __future__ import annotations
+
+import io
+import itertools
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from instrument import count, peak, timed
+from lazy import lazy_module
+from pixel_cache import PixelCache
+
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
+
+# Neighbor offsets as (dy, dx). 4-connectivity is the first half of the 8-list.
+NEIGHBORS_4 = ((0, -1), (0, 1), (-1, 0), (1, 0))
+NEIGHBORS_8 = NEIGHBORS_4 + ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+# Tiled execution: images with at least TILE_MIN_PIXELS pixels are split into row
+# bands processed on a thread pool (NumPy releases the GIL in these kernels).
+TILE_MIN_PIXELS = 1 << 22
+TILE_WORKERS = os.cpu_count() or 1
+_tile_pool: ThreadPoolExecutor | None = None
+
+
+class BufferCache:
+    """Least-recently-used cache of arrays, bounded by their total size in bytes."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._items: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """The cached array for `key`, computing (and caching) it on a miss.
+
+        Cached arrays are shared: callers must copy before writing to them. Safe to
+        call from several threads; compute() runs outside the lock.
+        """
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                count("cache_hits", 1)
+                return self._items[key]
+        value = compute()
+        value.flags.writeable = False
+        with self._lock:
+            if key not in self._items:
+                self.nbytes += value.nbytes
+            self._items[key] = value
+            while self.nbytes > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self.nbytes -= old.nbytes
+        return value
+
+
+# Set by keep_buffers(); None means nothing is kept between calls.
+_buffers: BufferCache | None = None
+# Set by use_pixel_cache(); None means sources are decoded on every run.
+_pixels: PixelCache | None = None
+
+
+def keep_buffers(max_bytes: int) -> BufferCache:
+    """Keep decoded sources (and cached() intermediates) in memory, e.g. for --watch."""
+    global _buffers
+    _buffers = BufferCache(max_bytes)
+    return _buffers
+
+
+def use_pixel_cache(root: Path, max_bytes: int) -> PixelCache:
+    """Map decoded sources from an on-disk cache shared between runs and scripts."""
+    global _pixels
+    _pixels = PixelCache(root, max_bytes)
+    return _pixels
+
+
+def source_key(path: Path) -> tuple:
+    """Identifies a file version without reading it: (path, mtime, size)."""
+    st = os.stat(path)
+    return str(Path(path).resolve()), st.st_mtime_ns, st.st_size
+
+
+def cached(key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+    """Read-only array for `key` from the buffer cache, or computed when it is off."""
+    if _buffers is None:
+        return compute()
+    return _buffers.get(key, compute)
+
+
+def _decode_rgba(path: Path) -> np.ndarray:
+    with timed("read"):
+        data = Path(path).read_bytes()
+    with timed("decode"), Image.open(io.BytesIO(data)) as img:
+        return np.array(img.convert("RGBA"))
+
+
+def view_rgba(path: Path) -> np.ndarray:
+    """The (H, W, 4) uint8 RGBA pixels of an image, for reading only.
+
+    From the buffer cache or a map of the pixel cache when those are on, so nothing
+    is decoded or copied.
+    """
+    if _pixels is None:
+        return cached(("rgba", *source_key(path)), lambda: _decode_rgba(path))
+    return cached(("rgba", *source_key(path)), lambda: _pixels.load(path, _decode_rgba))
+
+
+def load_rgba(path: Path) -> np.ndarray:
+    """Decode an image once into a writable (H, W, 4) uint8 RGBA array."""
+    if _buffers is not None:
+        return view_rgba(path).copy()
+    if _pixels is not None:
+        # Copy-on-write map: only the pages a pass writes to are copied.
+        return _pixels.load(path, _decode_rgba, writable=True)
+    return _decode_rgba(path)
+
+
+def to_image(arr: np.ndarray, mode: str = "RGBA") -> Image.Image:
+    """Wrap an (H, W, 4) array back into a PIL image, dropping alpha for mode="RGB"."""
+    img = Image.fromarray(arr)
+    if mode != "RGBA":
+        img = img.convert(mode)
+    return img
+
+
+def map_bands(
+    func: Callable[[int, int, int, int], object],
+    shape: tuple[int, ...],
+    *,
+    halo: int = 0,
+) -> list:
+    """Call func(lo, hi, y0, y1) for row bands [y0, y1) of an (H, W, ...) image.
+
+    [lo, hi) is the band grown by `halo` rows on each side (clipped to the image), for
+    neighborhood operations; func must only write rows [y0, y1), so bands never race.
+    Small images run as a single band. Returns func's results in band order.
+    """
+    global _tile_pool
+    h, w = shape[:2]
+    count("pixels_visited", h * w)
+    workers = TILE_WORKERS
+    if workers <= 1 or h * w < TILE_MIN_PIXELS or h < 2:
+        return [func(0, h, 0, h)]
+
+    n = min(h, workers * 2)
+    edges = [h * i // n for i in range(n + 1)]
+    bands = [
+        (max(0, y0 - halo), min(h, y1 + halo), y0, y1)
+        for y0, y1 in itertools.pairwise(edges)
+    ]
+    if _tile_pool is None:
+        _tile_pool = ThreadPoolExecutor(max_workers=workers)
+    return list(_tile_pool.map(lambda band: func(*band), bands))
+
+
+def pointwise(
+    func: Callable[[np.ndarray], np.ndarray], arr: np.ndarray, dtype: type = bool
+) -> np.ndarray:
+    """Evaluate a per-pixel function (e.g. a mask predicate) band by band."""
+    out = np.empty(arr.shape[:2], dtype=dtype)
+
+    def band(lo: int, hi: int, y0: int, y1: int) -> None:
+        out[y0:y1] = func(arr[y0:y1])
+
+    map_bands(band, arr.shape)
+    return out
+
+
+def fill_where(
+    arr: np.ndarray,
+    predicate: Callable[[np.ndarray], np.ndarray],
+    value: tuple[int, ...],
+) -> tuple[int, Region | None]:
+    """Set pixels matching `predicate` to `value`, in place and band by band.
+
+    Returns (pixels written, bounding box of those pixels).
+    """
+
+    def band(lo: int, hi: int, y0: int, y1: int) -> tuple[int, Region | None]:
+        rows = arr[y0:y1]
+        mask = predicate(rows)
+        rows[mask] = value
+        return int(np.count_nonzero(mask)), offset(alpha_bbox(mask), 0, y0)
+
+    n_filled = 0
+    region = None
+    for n, r in map_bands(band, arr.shape):
+        n_filled += n
+        region = union(region, r)
+    return n_filled, region
+
+
+def channel_min(arr: np.ndarray) -> np.ndarray:
+    """Per-pixel min of R, G, B (channel-wise ops avoid a reduction over axis 2)."""
+    return np.minimum(np.minimum(arr[..., 0], arr[..., 1]), arr[..., 2])
+
+
+def channel_max(arr: np.ndarray) -> np.ndarray:
+    return np.maximum(np.maximum(arr[..., 0], arr[..., 1]), arr[..., 2])
+
+
+def rgb_equals_mask(arr: np.ndarray, rgb: tuple[int, int, int]) -> np.ndarray:
+    r, g, b = rgb
+    return (arr[..., 0] == r) & (arr[..., 1] == g) & (arr[..., 2] == b)
+
+
+def rgb_near_mask(arr: np.ndarray, rgb: tuple[int, int, int], tol: int) -> np.ndarray:
+    """Pixels whose every channel differs from `rgb` by less than `tol` (alpha ignored)."""
+    mask = np.ones(arr.shape[:2], dtype=bool)
+    for c in range(3):
+        mask &= np.abs(arr[..., c].astype(np.int16) - int(rgb[c])) < tol
+    return mask
+
+
+# (left, upper, right, lower) with right/lower exclusive, like PIL boxes.
+Region = tuple[int, int, int, int]
+
+
+def alpha_bbox(alpha: np.ndarray) -> Region | None:
+    """Bounding box of nonzero pixels; same as `Image.getbbox()` on the alpha band."""
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(alpha.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1
+
+
+def expand(region: Region, halo: int, shape: tuple[int, ...]) -> Region:
+    """Grow `region` by `halo` pixels on every side, clipped to an (H, W, ...) shape."""
+    left, upper, right, lower = region
+    h, w = shape[:2]
+    return (
+        max(0, left - halo),
+        max(0, upper - halo),
+        min(w, right + halo),
+        min(h, lower + halo),
+    )
+
+
+def union(a: Region | None, b: Region | None) -> Region | None:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def offset(region: Region | None, dx: int, dy: int) -> Region | None:
+    """Translate a region found in a cropped window back to image coordinates."""
+    if region is None:
+        return None
+    left, upper, right, lower = region
+    return left + dx, upper + dy, right + dx, lower + dy
+
+
+def window(region: Region) -> tuple[slice, slice]:
+    """Row/column slices selecting `region` from an (H, W, ...) array."""
+    left, upper, right, lower = region
+    return slice(upper, lower), slice(left, right)
+
+
+def outside(region: Region, shape: tuple[int, ...]) -> list[tuple[slice, slice]]:
+    """Up to four non-overlapping slice pairs covering everything but `region`."""
+    left, upper, right, lower = region
+    h, w = shape[:2]
+    parts = [
+        (slice(0, upper), slice(0, w)),
+        (slice(lower, h), slice(0, w)),
+        (slice(upper, lower), slice(0, left)),
+        (slice(upper, lower), slice(right, w)),
+    ]
+    return [(ys, xs) for ys, xs in parts if ys.start < ys.stop and xs.start < xs.stop]
+
+
+def _touches(mask: np.ndarray) -> np.ndarray:
+    h, w = mask.shape
+    padded = np.zeros((h + 2, w + 2), dtype=bool)
+    padded[1:-1, 1:-1] = mask
+    out = np.zeros((h, w), dtype=bool)
+    for dy, dx in NEIGHBORS_8:
+        out |= padded[1 + dy : 1 + dy + h, 1 + dx : 1 + dx + w]
+    return out
+
+
+def touches_mask(mask: np.ndarray) -> np.ndarray:
+    """True where any of the 8 neighbors (not the pixel itself) is set.
+
+    Out-of-bounds neighbors count as unset, matching the per-pixel scans this replaces.
+    Bands carry a 1-row halo, so tiled results are identical at the seams.
+    """
+    out = np.empty(mask.shape, dtype=bool)
+
+    def band(lo: int, hi: int, y0: int, y1: int) -> None:
+        out[y0:y1] = _touches(mask[lo:hi])[y0 - lo : y1 - lo]
+
+    map_bands(band, mask.shape, halo=1)
+    return out
+
+
+def peel_mask(
+    candidate: np.ndarray, transparent: np.ndarray, iterations: int
+) -> tuple[np.ndarray, int]:
+    """Repeatedly peel `candidate` pixels that touch `transparent` (8-connected).
+
+    Each round removes every remaining candidate adjacent to transparency or to an
+    already-peeled pixel, exactly like a full rescan followed by a batch update. Only the
+    first round scans the whole mask (a 3x3 dilation); later rounds look at the
+    neighbors of the previous round's frontier, so extra iterations are nearly free.
+
+    Returns (peeled mask, number of rounds that peeled something).
+    """
+    h, w = candidate.shape
+    remaining = candidate.copy()
+    peeled = np.zeros_like(candidate)
+    dy = np.array([d[0] for d in NEIGHBORS_8])
+    dx = np.array([d[1] for d in NEIGHBORS_8])
+
+    ys, xs = np.nonzero(remaining & touches_mask(transparent))
+    rounds = 0
+    for _ in range(iterations):
+        if ys.size == 0:
+            break
+        rounds += 1
+        peak("peel_frontier_peak", ys.size)
+        remaining[ys, xs] = False
+        peeled[ys, xs] = True
+
+        # Next frontier: remaining candidates next to the pixels just peeled
+        ny = (ys[:, None] + dy).ravel()
+        nx = (xs[:, None] + dx).ravel()
+        inside = (ny >= 0) & (ny < h) & (nx >= 0) & (nx < w)
+        ny = ny[inside]
+        nx = nx[inside]
+        hit = remaining[ny, nx]
+        ys, xs = np.divmod(np.unique(ny[hit] * w + nx[hit]), w)
+
+    return peeled, rounds
+
+
+def border_seeds(
+    mask: np.ndarray,
+    region: Region | None = None,
+    shape: tuple[int, ...] | None = None,
+) -> np.ndarray:
+    """Boolean mask of `mask` pixels lying on the image border.
+
+    When `mask` is a crop at `region` of an image of `shape`, only the crop sides that
+    are also image sides produce seeds.
+    """
+    h, w = mask.shape
+    left, upper, right, lower = region or (0, 0, w, h)
+    full_h, full_w = (shape or mask.shape)[:2]
+    seeds = np.zeros_like(mask)
+    if mask.size == 0:
+        return seeds
+    if upper == 0:
+        seeds[0, :] = mask[0, :]
+    if lower == full_h:
+        seeds[-1, :] |= mask[-1, :]
+    if left == 0:
+        seeds[:, 0] |= mask[:, 0]
+    if right == full_w:
+        seeds[:, -1] |= mask[:, -1]
+    return seeds
+
+
+def corner_seeds(mask: np.ndarray) -> np.ndarray:
+    seeds = np.zeros_like(mask)
+    for y, x in ((0, 0), (0, -1), (-1, 0), (-1, -1)):
+        seeds[y, x] = mask[y, x]
+    return seeds
+
+
+def _runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Horizontal runs of `mask` in raster order as (row, start, end) arrays (end exclusive)."""
+    h, w = mask.shape
+    edges = np.zeros((h, w + 2), dtype=np.int8)
+    edges[:, 1:-1] = mask
+    edges = np.diff(edges, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows.astype(np.int32), starts.astype(np.int32), ends.astype(np.int32)
+
+
+def _int_array(values: np.ndarray) -> array:
+    """Copy an integer array into a compact array('i') for fast scalar indexing."""
+    out = array("i")
+    out.frombytes(values.astype(np.int32).tobytes())
+    return out
+
+
+def _run_links(
+    rows: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    width: int,
+    dy: int,
+    connectivity: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """For every run, the index range [lo, hi) of touching runs in row `row + dy`.
+
+    Runs within a row are disjoint and sorted, so touching runs are contiguous. Keys put
+    every row in its own stride so one searchsorted covers the whole image.
+    """
+    stride = width + 2
+    rows = rows.astype(np.int64)
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    reach = 1 if connectivity == 8 else 0
+    base = (rows + dy) * stride
+    lo = np.searchsorted(end_keys, base + starts - reach, side="right")
+    hi = np.searchsorted(start_keys, base + ends + reach, side="left")
+    return lo, np.maximum(hi, lo)
+
+
+def _paint_runs(
+    shape: tuple[int, int],
+    rows: np.ndarray,
+    starts: np.ndarray,
+    ends: np.ndarray,
+    values: np.ndarray,
+    dtype: type,
+) -> np.ndarray:
+    """Rasterize runs carrying `values` with a prefix sum over +value/-value markers."""
+    h, w = shape
+    out = np.zeros(h * w + 1, dtype=dtype)
+    flat_starts = rows.astype(np.int64) * w + starts
+    np.add.at(out, flat_starts, values)
+    np.add.at(out, flat_starts + (ends - starts), -values)
+    np.cumsum(out, out=out)
+    return out[:-1].reshape(h, w)
+
+
+def flood_fill(
+    mask: np.ndarray, seeds: np.ndarray, *, connectivity: int = 8
+) -> np.ndarray:
+    """Return the pixels of `mask` connected to any pixel of `seeds & mask`.
+
+    Scanline (span) fill: each queue entry is a whole horizontal run of `mask`, and the
+    runs it reaches in the rows above and below are looked up as index ranges.
+    """
+    h, w = mask.shape
+    rows, starts, ends = _runs(mask)
+    if rows.size == 0:
+        return np.zeros_like(mask)
+
+    seed_y, seed_x = np.nonzero(seeds & mask)
+    stride = w + 2
+    run_keys = rows.astype(np.int64) * stride + starts
+    seed_runs = np.searchsorted(run_keys, seed_y * stride + seed_x, side="right") - 1
+    del run_keys
+
+    # Every run is queued at most once, so the FIFO is a flat int32 array with a read
+    # and a write cursor; at the end queue[:tail] lists exactly the filled runs. The
+    # links live in int32 arrays too: a few bytes per run instead of Python lists.
+    up_lo, up_hi = (
+        _int_array(v) for v in _run_links(rows, starts, ends, w, -1, connectivity)
+    )
+    dn_lo, dn_hi = (
+        _int_array(v) for v in _run_links(rows, starts, ends, w, 1, connectivity)
+    )
+
+    filled = bytearray(rows.size)
+    queue = array("i", bytes(4 * rows.size))
+    tail = 0
+    for run in np.unique(seed_runs).tolist():
+        filled[run] = 1
+        queue[tail] = run
+        tail += 1
+
+    head = 0
+    high = tail
+    while head < tail:
+        high = max(high, tail - head)
+        run = queue[head]
+        head += 1
+        for nrun in range(up_lo[run], up_hi[run]):
+            if not filled[nrun]:
+                filled[nrun] = 1
+                queue[tail] = nrun
+                tail += 1
+        for nrun in range(dn_lo[run], dn_hi[run]):
+            if not filled[nrun]:
+                filled[nrun] = 1
+                queue[tail] = nrun
+                tail += 1
+
+    peak("flood_queue_peak", high)
+    count("flood_runs", rows.size)
+    hit = np.frombuffer(queue, dtype=np.int32, count=tail)
+    return _paint_runs(
+        (h, w),
+        rows[hit],
+        starts[hit],
+        ends[hit],
+        np.ones(tail, np.int8),
+        np.int8,
+    ).view(bool)
+
+
+def label_components(
+    mask: np.ndarray, *, connectivity: int = 8
+) -> tuple[np.ndarray, int]:
+    """Label the connected components of `mask` with two-pass, run-length union-find.
+
+    Pass one links each horizontal run to the overlapping runs of the row above; pass
+    two resolves the equivalences and paints one int32 label per pixel. Labels run
+    1..n in raster order of each component's first pixel, 0 is background.
+    """
+    h, w = mask.shape
+    rows, starts, ends = _runs(mask)
+    n_runs = rows.size
+    if n_runs == 0:
+        return np.zeros((h, w), dtype=np.int32), 0
+
+    count("label_runs", n_runs)
+    lo, hi = _run_links(rows, starts, ends, w, -1, connectivity)
+    counts = hi - lo
+    cur = np.repeat(np.arange(n_runs), counts)
+    prev = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(cur.size)
+
+    # Union by lowest run index so each root is the component's first run.
+    parent = list(range(n_runs))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for a, b in zip(_int_array(prev), _int_array(cur)):
+        ra = find(a)
+        rb = find(b)
+        if ra < rb:
+            parent[rb] = ra
+        elif rb < ra:
+            parent[ra] = rb
+
+    roots = np.fromiter((find(i) for i in range(n_runs)), dtype=np.int64, count=n_runs)
+    is_root = roots == np.arange(n_runs)
+    run_labels = np.cumsum(is_root, dtype=np.int32)[roots]
+
+    labels = _paint_runs((h, w), rows, starts, ends, run_labels, np.int32)
+    return labels, int(is_root.sum())
+
+
+def largest_component(mask: np.ndarray, *, connectivity: int = 8) -> np.ndarray:
+    """Return the largest connected component of `mask`.
+
+    Ties go to the component whose first pixel comes first in raster order.
+    """
+    labels, n = label_components(mask, connectivity=connectivity)
+    if n == 0:
+        return np.zeros_like(mask)
+    sizes = np.bincount(labels.ravel(), minlength=n + 1)
+    sizes[0] = 0
+    return labels == int(np.argmax(sizes))
+
+
+def composite_over(arr: np.ndarray, rgb: tuple[int, int, int]) -> np.ndarray:
+    """Composite `arr` over a solid `rgb` background and return the RGB result.
+
+    Uses the same rounding as PIL's `Image.paste(img, box, img)` so outputs stay bit-identical.
+    """
+    a = arr[..., 3:4].astype(np.uint32)
+    fg = arr[..., :3].astype(np.uint32)
+    bg = np.array(rgb, dtype=np.uint32)
+    tmp = bg * (255 - a) + fg * a + 128
+    out = np.empty_like(arr)
+    out[..., :3] = (((tmp >> 8) + tmp) >> 8).astype(np.uint8)
+    out[..., 3] = 255
+    return out
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+# Polling keeps this dependency-free; stat() on a few dozen files is cheap.
+POLL_SECONDS = 0.2
+# A burst of writes (an editor saving, a sync tool copying) settles before a rebuild.
+DEBOUNCE_SECONDS = 0.3
+# Memory for decoded sources and intermediates kept between rebuilds.
+BUFFER_BYTES = 512 << 20
+
+
+def _snapshot(paths: Iterable[Path]) -> dict[Path, tuple[int, int]]:
+    state: dict[Path, tuple[int, int]] = {}
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        state[p] = (st.st_mtime_ns, st.st_size)
+    return state
+
+
+def watch(
+    watched: Callable[[], Iterable[Path]],
+    rebuild: Callable[[set[Path]], None],
+    *,
+    poll: float = POLL_SECONDS,
+    debounce: float = DEBOUNCE_SECONDS,
+) -> None:
+    """Call rebuild(changed paths) whenever files in watched() change, until Ctrl+C.
+
+    watched() is re-evaluated on every poll, so new files matching a glob are picked
+    up. Changes are collected until nothing has changed for `debounce` seconds. Files
+    written by rebuild() itself do not trigger another round. Errors raised by rebuild()
+    are printed and watching continues; so are errors from watched() (e.g. a
+    half-saved recipe file), which then keeps its last good file list.
+    """
+    files: list[Path] = []
+    failure: str | None = None
+
+    def listed() -> list[Path]:
+        nonlocal files, failure
+        try:
+            files = list(watched())
+        except Exception as e:  # noqa: BLE001
+            if repr(e) != failure:
+                print(f"! Could not list watched files: {e!r}")
+            failure = repr(e)
+        else:
+            failure = None
+        return files
+
+    seen = _snapshot(listed())
+    print(f"Watching {len(seen)} files for changes (Ctrl+C to stop)...")
+    pending: set[Path] = set()
+    last_change = 0.0
+    try:
+        while True:
+            time.sleep(poll)
+            now = _snapshot(listed())
+            changed = {p for p in now.keys() | seen.keys() if now.get(p) != seen.get(p)}
+            seen = now
+            if changed:
+                pending |= changed
+                last_change = time.monotonic()
+                continue
+            if not pending or time.monotonic() - last_change < debounce:
+                continue
+
+            batch, pending = pending, set()
+            start = time.perf_counter()
+            names = ", ".join(sorted(p.name for p in batch))
+            print(f"\nChanged: {names}")
+            # SystemExit too: the scripts raise it for errors like "no targets found".
+            try:
+                rebuild(batch)
+            except (Exception, SystemExit) as e:  # noqa: BLE001
+                print(f"! Rebuild failed: {e!r}")
+            print(f"Rebuilt in {time.perf_counter() - start:.2f}s. Watching...")
+            seen = _snapshot(listed())
+    except KeyboardInterrupt:
+        print("\nStopped watching.")